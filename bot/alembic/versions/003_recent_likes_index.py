@@ -0,0 +1,41 @@
+"""recent likes index
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Последние лайки пользователя: ORDER BY created_at DESC, id DESC LIMIT n.
+    # CONCURRENTLY - чтобы не блокировать запись в interactions на время построения
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_interactions_user_likes",
+            "interactions",
+            ["user_id", "created_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("action = 'like'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_interactions_user_likes",
+            table_name="interactions",
+            postgresql_concurrently=True,
+        )
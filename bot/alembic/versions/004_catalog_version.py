@@ -0,0 +1,67 @@
+"""catalog version
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Версия каталога треков: одна строка, увеличивается при любом изменении tracks
+    op.create_table(
+        "catalog_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 0)")
+
+    # Триггер на уровне оператора: пачка вставок populate_tracks.py - одно
+    # увеличение версии и одно уведомление (доставляется после коммита)
+    op.execute(
+        """
+        CREATE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        DECLARE
+            new_version bigint;
+        BEGIN
+            UPDATE catalog_version
+            SET version = version + 1, updated_at = now()
+            WHERE id = 1
+            RETURNING version INTO new_version;
+            PERFORM pg_notify('catalog_changed', new_version::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER tracks_catalog_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tracks
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS tracks_catalog_version ON tracks")
+    op.execute("DROP FUNCTION IF EXISTS bump_catalog_version()")
+    op.drop_table("catalog_version")
@@ -0,0 +1,11 @@
+"""
+Бенчмарки горячего пути рекомендаций на синтетических данных.
+
+Запуск (из каталога bot):
+
+    python -m bench run --sizes 8k,100k,1M
+    python -m bench compare bench/results/old.json bench/results/new.json
+
+Данные (аудио, parquet с эмбеддингами, stub-модель) генерируются в
+bench/data и переиспользуются между запусками; сеть и GPU не нужны.
+"""
@@ -0,0 +1,104 @@
+import gc
+import resource
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Tuple, TypeVar
+
+import numpy as np
+
+from recsys.embedding_table import rss_mb
+
+T = TypeVar("T")
+
+
+def peak_rss_mb() -> float:
+    """Пиковый resident set процесса в МБ (ru_maxrss - КБ на Linux, байты на macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+@dataclass
+class StageResult:
+    samples: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    # Аллокации Python/numpy за один вызов (tracemalloc не видит память torch)
+    alloc_mb: float
+    alloc_blocks: int
+    rss_mb: float
+    peak_rss_mb: float
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(value, 4) for name, value in asdict(self).items()}
+
+
+def measure(fn: Callable[[int], object], repeat: int, warmup: int = 2) -> StageResult:
+    """
+    Замеряет стадию
+
+    Время меряется без tracemalloc (он замедляет аллокации в разы),
+    аллокации - отдельным вызовом после замеров.
+
+    Args:
+        fn: Вызов стадии, получает номер итерации
+        repeat: Сколько замеров сделать
+        warmup: Сколько вызовов сделать до замеров
+    """
+    for i in range(warmup):
+        fn(i)
+
+    gc.collect()
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(warmup + i)
+        timings[i] = (time.perf_counter() - started) * 1000
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    fn(warmup + repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return StageResult(
+        samples=repeat,
+        mean_ms=float(timings.mean()),
+        p50_ms=float(p50),
+        p95_ms=float(p95),
+        p99_ms=float(p99),
+        max_ms=float(timings.max()),
+        alloc_mb=peak / 2**20,
+        alloc_blocks=blocks,
+        rss_mb=rss_mb(),
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+def measure_once(fn: Callable[[], T]) -> Tuple[T, StageResult]:
+    """Одноразовая стадия (загрузка модели и каталога), возвращает и ее результат"""
+    gc.collect()
+    started = time.perf_counter()
+    value = fn()
+    elapsed = (time.perf_counter() - started) * 1000
+    return value, StageResult(
+        samples=1,
+        mean_ms=elapsed,
+        p50_ms=elapsed,
+        p95_ms=elapsed,
+        p99_ms=elapsed,
+        max_ms=elapsed,
+        alloc_mb=0.0,
+        alloc_blocks=0,
+        rss_mb=rss_mb(),
+        peak_rss_mb=peak_rss_mb(),
+    )
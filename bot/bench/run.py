@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import torch
+from loguru import logger
+
+from bench.measure import measure, measure_once
+from bench.synthetic import SyntheticDataset, generate, parse_size
+from domain.entity.track import Track
+from recsys.frontend import MelFrontend
+from recsys.prefilter import CandidateFilter
+from recsys.embedding_table import EmbeddingTable
+from recsys.model import RecommendationModel, fix_length, load_mel, recommend_similar
+
+BENCH_DIR = Path(__file__).parent
+SEQ_LEN = 3
+
+
+def bench_catalog(dataset: SyntheticDataset, repeat: int, threads: int) -> Dict[str, dict]:
+    """
+    Замеры всех стадий на одном каталоге. Запускается в отдельном процессе,
+    чтобы пиковый RSS не переносился между размерами каталога.
+    """
+    torch.set_num_threads(threads)
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    workdir = Path(dataset.root) / "run"
+    shutil.rmtree(workdir, ignore_errors=True)
+    # Конвертация parquet -> .npy - разовая операция, в загрузку модели не входит
+    for parquet in (dataset.embeddings_parquet, dataset.audio_features_parquet):
+        EmbeddingTable.load(parquet)
+    EmbeddingTable.load(dataset.embeddings_parquet).normalized(
+        Path(dataset.embeddings_parquet).with_suffix(".normalized.npy"),
+        source=dataset.embeddings_parquet,
+    )
+
+    stages = {}
+    model, stages["model_load"] = measure_once(
+        lambda: RecommendationModel(
+            model_path=dataset.model_path,
+            embeddings_parquet=dataset.embeddings_parquet,
+            audio_features_parquet=dataset.audio_features_parquet,
+            mel_store_dir=str(workdir / "mel_store"),
+            encoder_cache_dir=str(workdir / "encoder_cache"),
+            ann_index_path=str(workdir / "ann_index" / "ivf.npz"),
+        )
+    )
+
+    audio = dataset.audio
+    n_calls = repeat + 3
+    rng = np.random.default_rng(0)
+
+    stages["load_mel"] = measure(lambda i: load_mel(audio[i % len(audio)][1]), repeat)
+
+    mels = [load_mel(path) for _, path in audio[: min(len(audio), 8)]]
+    stages["fix_length"] = measure(lambda i: fix_length(mels[i % len(mels)], model.TARGET_LEN), repeat)
+
+    frontend = MelFrontend(target_len=model.TARGET_LEN)
+    buffer = np.empty((SEQ_LEN, frontend.n_mels, model.TARGET_LEN), dtype=np.float32)
+    stages["mel_frontend"] = measure(
+        lambda i: frontend.load(
+            [audio[(i + j) % len(audio)][1] for j in range(SEQ_LEN)], out=buffer
+        ),
+        repeat,
+    )
+    # Расхождение пакетного фронтенда с эталонным load_mel + fix_length, дБ
+    reference = np.stack([fix_length(mel, model.TARGET_LEN) for mel in mels])
+    batched = frontend.load([path for _, path in audio[: len(mels)]])
+    parity = {"mel_frontend_max_abs_db": float(np.abs(reference - batched).max())}
+
+    features = model.track_embeddings_features
+    sequences = [rng.choice(len(audio), size=SEQ_LEN, replace=False) for _ in range(n_calls)]
+    inputs = [
+        (
+            torch.from_numpy(np.stack([fix_length(mels[j % len(mels)], model.TARGET_LEN) for j in seq]))
+            .float()
+            .unsqueeze(1),
+            torch.from_numpy(np.stack([features[audio[j][0]] for j in seq]).astype(np.float32)),
+        )
+        for seq in sequences
+    ]
+
+    def forward(i: int) -> None:
+        with torch.no_grad():
+            model.model(*inputs[i % len(inputs)])
+
+    stages["model_forward"] = measure(forward, repeat)
+
+    queries = torch.from_numpy(rng.standard_normal((n_calls, dataset.dim), dtype=np.float32))
+    exclude = [[audio[j][0] for j in seq] for seq in sequences]
+    stages["recommend_similar"] = measure(
+        lambda i: recommend_similar(queries[i], model.search, exclude_ids=exclude[i]), repeat
+    )
+
+    likes = [
+        [Track(audio[j][0], "", "", 30000, "", audio[j][1]) for j in seq] for seq in sequences
+    ]
+    # Спектрограммы и выходы энкодера всего аудио-пула считаются до замеров
+    for start in range(0, len(audio), SEQ_LEN):
+        model.pick_next(
+            [Track(track_id, "", "", 30000, "", path) for track_id, path in audio[start : start + SEQ_LEN]]
+        )
+    # Без кэша предсказаний каждый вызов проходит модель и поиск
+    capacity = model.prediction_cache.capacity
+    model.prediction_cache.capacity = 0
+    stages["pick_next"] = measure(lambda i: model.pick_next(likes[i]), repeat)
+    # То же с предфильтром по двум признакам: сколько треков реально скорится
+    model.prefilter = CandidateFilter(
+        model.search.ids,
+        model.track_embeddings_features,
+        columns=[0, 1],
+        min_candidates=min(2000, dataset.n_tracks // 10),
+    )
+    stages["pick_next_prefilter"] = measure(lambda i: model.pick_next(likes[i]), repeat)
+    prefilter = model.prefilter.stats()
+    model.prefilter = None
+    model.prediction_cache.capacity = capacity
+    stages["pick_next_cached"] = measure(lambda i: model.pick_next(likes[i % 4]), repeat)
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "stages": {name: result.as_dict() for name, result in stages.items()},
+        "parity": parity,
+        "prefilter": prefilter,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args: argparse.Namespace) -> Path:
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+            "torch_threads": args.threads,
+        },
+        "params": {"repeat": args.repeat, "dim": args.dim, "n_features": args.n_features},
+        "sizes": {},
+    }
+
+    for size in args.sizes.split(","):
+        n_tracks = parse_size(size)
+        dataset = generate(
+            Path(args.data_dir) / size,
+            n_tracks,
+            dim=args.dim,
+            n_features=args.n_features,
+            n_audio=args.n_audio,
+        )
+        logger.info(f"Benchmarking {size} ({n_tracks} tracks)")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            measured = pool.submit(bench_catalog, dataset, args.repeat, args.threads).result()
+        results["sizes"][size] = {"n_tracks": n_tracks, **measured}
+        for name, stage in measured["stages"].items():
+            logger.info(
+                f"{size:>6} {name:<18} p50={stage['p50_ms']:9.2f}ms p95={stage['p95_ms']:9.2f}ms "
+                f"p99={stage['p99_ms']:9.2f}ms alloc={stage['alloc_mb']:8.2f}MB "
+                f"peak_rss={stage['peak_rss_mb']:8.1f}MB"
+            )
+
+    output = Path(args.output) if args.output else (
+        BENCH_DIR / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    logger.info(f"Results written to {output}")
+    return output
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Сравнивает два прогона, код возврата 1 - есть регрессии больше порога"""
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    logger.info(f"{baseline['commit']} -> {current['commit']}")
+
+    regressions = 0
+    for size, entry in current["sizes"].items():
+        base_stages = baseline["sizes"].get(size, {}).get("stages", {})
+        for name, stage in entry["stages"].items():
+            base = base_stages.get(name)
+            if base is None:
+                continue
+            for metric in ("p50_ms", "p95_ms", "peak_rss_mb"):
+                ratio = stage[metric] / base[metric] if base[metric] else 1.0
+                regressed = ratio > 1 + args.threshold
+                regressions += regressed
+                if regressed or args.verbose:
+                    logger.log(
+                        "WARNING" if regressed else "INFO",
+                        f"{size:>6} {name:<18} {metric:<12} {base[metric]:10.2f} -> "
+                        f"{stage[metric]:10.2f} ({ratio:.2f}x)",
+                    )
+    logger.info(f"{regressions} regressions above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк горячего пути рекомендаций")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Прогнать бенчмарк")
+    run_parser.add_argument(
+        "--sizes", type=str, default="8k,100k,1M", help="Размеры каталога через запятую"
+    )
+    run_parser.add_argument("--repeat", type=int, default=50, help="Замеров на стадию")
+    run_parser.add_argument("--threads", type=int, default=1, help="Потоков torch")
+    run_parser.add_argument("--dim", type=int, default=256, help="Размерность эмбеддингов")
+    run_parser.add_argument(
+        "--n-features", type=int, default=64, help="Размерность аудио-признаков"
+    )
+    run_parser.add_argument("--n-audio", type=int, default=32, help="Сколько mp3 сгенерировать")
+    run_parser.add_argument(
+        "--data-dir", type=str, default=str(BENCH_DIR / "data"), help="Каталог синтетических данных"
+    )
+    run_parser.add_argument("--output", type=str, default=None, help="Путь к JSON с результатами")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить два прогона")
+    compare_parser.add_argument("baseline", type=str)
+    compare_parser.add_argument("current", type=str)
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Допустимое замедление (0.1 = 10%%)"
+    )
+    compare_parser.add_argument("--verbose", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import torch
+import torch.nn as nn
+
+
+class StubRecommender(nn.Module):
+    """
+    Модель с тем же интерфейсом, что и боевая: последовательность из S
+    треков (S, 1, n_mels, T) + аудио-признаки (S, F) -> эмбеддинги (S, D).
+
+    Есть разделение encode/aggregate, поэтому через нее проходит тот же
+    путь с кэшем энкодера. Веса случайные - важна только стоимость слоев.
+    """
+
+    def __init__(self, n_features: int, dim: int, n_heads: int = 4):
+        super().__init__()
+        self.conv = nn.Sequential(
+            nn.Conv2d(1, 16, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(16, 32, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(32, 64, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.AdaptiveAvgPool2d(1),
+        )
+        self.proj = nn.Linear(64 + n_features, dim)
+        self.transformer = nn.TransformerEncoderLayer(
+            dim, n_heads, dim_feedforward=2 * dim, batch_first=True
+        )
+        self.head = nn.Linear(dim, dim)
+
+    def encode(self, mel: torch.Tensor, meta: torch.Tensor) -> torch.Tensor:
+        audio = self.conv(mel).flatten(1)
+        return self.proj(torch.cat([audio, meta], dim=1))
+
+    def aggregate(self, encoded: torch.Tensor) -> torch.Tensor:
+        return self.head(self.transformer(encoded.unsqueeze(0)).squeeze(0))
+
+    def forward(self, mel: torch.Tensor, meta: torch.Tensor) -> torch.Tensor:
+        return self.aggregate(self.encode(mel, meta))
@@ -0,0 +1,136 @@
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import soundfile as sf
+import torch
+from loguru import logger
+
+from bench.stub_model import StubRecommender
+
+SAMPLE_RATE = 22050
+DURATION = 30
+PARQUET_CHUNK = 100_000
+
+
+@dataclass(frozen=True)
+class SyntheticDataset:
+    root: str
+    n_tracks: int
+    dim: int
+    n_features: int
+    embeddings_parquet: str
+    audio_features_parquet: str
+    model_path: str
+    # (FMA id, путь к mp3) треков, для которых есть аудио
+    audio: List[Tuple[int, str]]
+
+
+def parse_size(size: str) -> int:
+    """'8k' -> 8000, '1M' -> 1000000"""
+    size = size.strip()
+    multiplier = {"k": 10**3, "m": 10**6}.get(size[-1].lower(), 1)
+    return int(float(size[:-1] if multiplier > 1 else size) * multiplier)
+
+
+def synth_audio(rng: np.random.Generator, duration: float = DURATION) -> np.ndarray:
+    """Несколько гармоник со случайной огибающей и шумом"""
+    t = np.arange(int(SAMPLE_RATE * duration)) / SAMPLE_RATE
+    y = np.zeros_like(t)
+    for freq in rng.uniform(80, 2000, size=4):
+        y += np.sin(2 * np.pi * freq * t + rng.uniform(0, 2 * np.pi))
+    y *= 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(0.5, 4) * t)
+    y += 0.05 * rng.standard_normal(len(t))
+    return (0.2 * y / np.abs(y).max()).astype(np.float32)
+
+
+def write_vectors(path: Path, ids: np.ndarray, dim: int, rng: np.random.Generator) -> None:
+    """
+    Parquet в формате EmbeddingTable.from_parquet (track_id + по колонке
+    на компоненту), пишется кусками, чтобы 1M строк не собирались в памяти
+    """
+    columns = ["track_id"] + [f"f{i}" for i in range(dim)]
+    schema = pa.schema(
+        [pa.field("track_id", pa.int64())] + [pa.field(name, pa.float32()) for name in columns[1:]]
+    )
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, len(ids), PARQUET_CHUNK):
+            chunk_ids = ids[start : start + PARQUET_CHUNK]
+            matrix = rng.standard_normal((len(chunk_ids), dim), dtype=np.float32)
+            arrays = [pa.array(chunk_ids)] + [pa.array(matrix[:, i]) for i in range(dim)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def generate(
+    root: str | Path,
+    n_tracks: int,
+    dim: int = 256,
+    n_features: int = 64,
+    n_audio: int = 32,
+    seed: int = 0,
+) -> SyntheticDataset:
+    """
+    Генерирует (или переиспользует) синтетический каталог
+
+    Аудио создается только для n_audio треков: декодирование и спектрограмма
+    от размера каталога не зависят, а 1M mp3 файлов бенчмарку не нужны.
+
+    Args:
+        root: Каталог для данных
+        n_tracks: Размер каталога
+        dim: Размерность эмбеддингов треков
+        n_features: Размерность аудио-признаков
+        n_audio: Сколько треков получат mp3
+        seed: Зерно генератора
+    """
+    root = Path(root)
+    meta_path = root / "dataset.json"
+    if meta_path.exists():
+        dataset = SyntheticDataset(**json.loads(meta_path.read_text()))
+        if (dataset.n_tracks, dataset.dim, dataset.n_features, len(dataset.audio)) == (
+            n_tracks,
+            dim,
+            n_features,
+            n_audio,
+        ):
+            return dataset
+
+    logger.info(f"Generating synthetic catalog of {n_tracks} tracks in {root}")
+    rng = np.random.default_rng(seed)
+    (root / "audio").mkdir(parents=True, exist_ok=True)
+
+    # FMA id начинаются с 2 и идут с пропусками, как в fma_small
+    ids = np.sort(rng.choice(np.arange(2, 2 * n_tracks + 2), size=n_tracks, replace=False))
+
+    embeddings_parquet = root / "after_model_parquet.parquet"
+    audio_features_parquet = root / "audio_features.parquet"
+    write_vectors(embeddings_parquet, ids, dim, rng)
+    write_vectors(audio_features_parquet, ids, n_features, rng)
+
+    audio = []
+    for track_id in rng.choice(ids, size=min(n_audio, n_tracks), replace=False):
+        path = root / "audio" / f"{track_id:06d}.mp3"
+        if not path.exists():
+            sf.write(path, synth_audio(rng), SAMPLE_RATE, format="MP3")
+        audio.append((int(track_id), str(path)))
+
+    torch.manual_seed(seed)
+    model_path = root / "stub_model.pt"
+    torch.save(StubRecommender(n_features, dim).eval(), model_path)
+
+    dataset = SyntheticDataset(
+        root=str(root),
+        n_tracks=n_tracks,
+        dim=dim,
+        n_features=n_features,
+        embeddings_parquet=str(embeddings_parquet),
+        audio_features_parquet=str(audio_features_parquet),
+        model_path=str(model_path),
+        audio=audio,
+    )
+    meta_path.write_text(json.dumps(asdict(dataset)))
+    return dataset
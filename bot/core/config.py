@@ -14,6 +14,79 @@ class Settings(BaseSettings):
     BOT_TOKEN: str
     POSTGRES_URL: str
 
+    # Артефакты модели
+    MODEL_PATH: str = "recommender_model.pkl"
+    EMBEDDINGS_PARQUET: str = "after_model_parquet.parquet"
+    AUDIO_FEATURES_PARQUET: str = "audio_features.parquet"
+    EMBEDDINGS_DTYPE: str = "float32"  # float16 - вдвое меньше памяти
+    EMBEDDINGS_MMAP: bool = True
+    # "eager", "torchscript" или "int8" (см. scripts/optimize_model.py)
+    INFERENCE_MODE: str = "eager"
+
+    # Кэш мел-спектрограмм
+    MEL_STORE_DIR: str = "mel_store"
+    # Треков в LRU каждого процесса (float16, ~325 КБ на трек), остальное - page cache
+    MEL_CACHE_SIZE: int = 64
+
+    # Кэш выходов аудио-энкодера
+    ENCODER_CACHE_DIR: str = "encoder_cache"
+
+    # Инференс вне event loop: "thread" или "process" (RECSYS_WORKERS процессов,
+    # матрицы эмбеддингов общие для всех через mmap)
+    RECSYS_EXECUTOR: str = "thread"
+    RECSYS_WORKERS: int = 1
+    RECSYS_MAX_CONCURRENCY: int = 4
+    # 0 - поделить ядра поровну между воркерами
+    TORCH_NUM_THREADS: int = 0
+    # Микробатчинг одновременных запросов
+    RECSYS_MAX_BATCH_SIZE: int = 16
+    RECSYS_MAX_WAIT_MS: float = 5
+    RECSYS_MAX_QUEUE_SIZE: int = 256
+    # Как часто проверять артефакты модели на диске (сек), 0 - без перезагрузки
+    RECSYS_RELOAD_INTERVAL: float = 60
+
+    # Кэш профилей пользователей по telegram_id
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 300
+
+    # Снимок каталога треков: как часто проверять версию без NOTIFY (сек)
+    # и пауза перед перечитыванием после уведомления
+    CATALOG_POLL_INTERVAL: float = 60
+    CATALOG_DEBOUNCE: float = 1
+
+    # Очередь следующих рекомендаций на пользователя
+    RECOMMENDATION_QUEUE_SIZE: int = 5
+
+    # Офлайн top-K (scripts/batch_recommend.py): сколько треков хранить на
+    # пользователя и сколько секунд результат считается свежим
+    BATCH_RECOMMENDATIONS_K: int = 20
+    BATCH_RECOMMENDATIONS_MAX_AGE: float = 86400
+
+    # Холодный старт: топ популярных треков по жанрам, пересборка топа (сек)
+    POPULARITY_SIZE: int = 200
+    POPULARITY_REFRESH_SECONDS: float = 10
+
+    # Кэш предсказаний по последним лайкам
+    PREDICTION_CACHE_SIZE: int = 4096
+    PREDICTION_CACHE_TTL: float = 3600
+    PREDICTION_CACHE_CANDIDATES: int = 50
+
+    # Поиск ближайших треков: "exact" или "ivf"
+    RECSYS_SEARCH: str = "exact"
+    ANN_N_LISTS: int = 0  # 0 - 4 * sqrt(размер каталога)
+    ANN_NPROBE: int = 8
+    ANN_INDEX_PATH: str = "ann_index/ivf.npz"
+
+    # Предфильтр кандидатов до скоринга эмбеддингов
+    PREFILTER_ENABLED: bool = False
+    # Колонки audio_features.parquet для корзин через запятую (например, "tempo,energy")
+    PREFILTER_FEATURES: str = ""
+    PREFILTER_BUCKETS: int = 8
+    # Ограничение не применяется, если после него остается меньше треков
+    PREFILTER_MIN_CANDIDATES: int = 2000
+    # fma_metadata/tracks.csv или csv/parquet с колонками track_id, genre_top; пусто - без жанров
+    TRACK_GENRES_PATH: str = ""
+
     @computed_field  # type: ignore[misc]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
@@ -1,11 +1,17 @@
 from dependency_injector import containers, providers
 
-from core.database import async_session_factory
+from core.database import async_session_factory, engine, get_session
 from repository.user import UserRepository
 from repository.track import TrackRepository
+from repository.recommendation import RecommendationRepository
+from repository.user_cache import UserCache
+from repository.track_catalog import TrackCatalog
 from service.user import UserService
 from service.track import TrackService
-from recsys.model import RecommendationModel
+from service.recommendation_queue import RecommendationQueues
+from service.popularity import PopularityRanking
+from recsys.executor import AsyncRecommender
+from recsys.exclusions import ExclusionBitmaps
 
 
 class Container(containers.DeclarativeContainer):
@@ -14,23 +20,94 @@ class Container(containers.DeclarativeContainer):
     # Конфигурация
     config = providers.Configuration()
 
-    # Database
-    session_factory = providers.Factory(async_session_factory)
+    # Database: внутри апдейта - общая сессия unit of work, иначе новая
+    session_factory = providers.Factory(get_session)
+
+    # Кэш профилей пользователей (singleton, общий для всех апдейтов)
+    user_cache = providers.Singleton(
+        UserCache,
+        capacity=config.USER_CACHE_SIZE,
+        ttl_seconds=config.USER_CACHE_TTL,
+    )
 
     # Repositories (создаются для каждого запроса)
     user_repository = providers.Factory(
         UserRepository,
         session=session_factory,
+        user_cache=user_cache,
+    )
+
+    # Снимок каталога треков (singleton, свои сессии и LISTEN-соединение)
+    track_catalog = providers.Singleton(
+        TrackCatalog,
+        session_factory=providers.Object(async_session_factory),
+        engine=providers.Object(engine),
+        poll_interval=config.CATALOG_POLL_INTERVAL,
+        debounce=config.CATALOG_DEBOUNCE,
     )
 
     track_repository = providers.Factory(
         TrackRepository,
         session=session_factory,
+        catalog=track_catalog,
+    )
+
+    recommendation_repository = providers.Factory(
+        RecommendationRepository,
+        session=session_factory,
     )
 
+    # Маски прослушанных треков (singleton, общие для всех апдейтов)
+    exclusions = providers.Singleton(ExclusionBitmaps)
+
     # Model (singleton)
     recsys_model = providers.Singleton(
-        RecommendationModel,
+        AsyncRecommender,
+        model_kwargs=providers.Dict(
+            model_path=config.MODEL_PATH,
+            embeddings_parquet=config.EMBEDDINGS_PARQUET,
+            audio_features_parquet=config.AUDIO_FEATURES_PARQUET,
+            embeddings_dtype=config.EMBEDDINGS_DTYPE,
+            embeddings_mmap=config.EMBEDDINGS_MMAP,
+            mel_store_dir=config.MEL_STORE_DIR,
+            mel_cache_size=config.MEL_CACHE_SIZE,
+            encoder_cache_dir=config.ENCODER_CACHE_DIR,
+            search_kind=config.RECSYS_SEARCH,
+            ann_n_lists=config.ANN_N_LISTS,
+            ann_nprobe=config.ANN_NPROBE,
+            ann_index_path=config.ANN_INDEX_PATH,
+            prediction_cache_size=config.PREDICTION_CACHE_SIZE,
+            prediction_cache_ttl=config.PREDICTION_CACHE_TTL,
+            prediction_cache_candidates=config.PREDICTION_CACHE_CANDIDATES,
+            inference_mode=config.INFERENCE_MODE,
+            prefilter_enabled=config.PREFILTER_ENABLED,
+            prefilter_features=config.PREFILTER_FEATURES,
+            prefilter_buckets=config.PREFILTER_BUCKETS,
+            prefilter_min_candidates=config.PREFILTER_MIN_CANDIDATES,
+            track_genres_path=config.TRACK_GENRES_PATH,
+        ),
+        executor=config.RECSYS_EXECUTOR,
+        workers=config.RECSYS_WORKERS,
+        max_concurrency=config.RECSYS_MAX_CONCURRENCY,
+        torch_threads=config.TORCH_NUM_THREADS,
+        max_batch_size=config.RECSYS_MAX_BATCH_SIZE,
+        max_wait_ms=config.RECSYS_MAX_WAIT_MS,
+        max_queue_size=config.RECSYS_MAX_QUEUE_SIZE,
+        exclusions=exclusions,
+        reload_interval=config.RECSYS_RELOAD_INTERVAL,
+    )
+
+    # Очереди рекомендаций (singleton, общие для всех апдейтов)
+    recommendation_queues = providers.Singleton(
+        RecommendationQueues,
+        size=config.RECOMMENDATION_QUEUE_SIZE,
+    )
+
+    # Популярные треки для холодного старта (singleton)
+    popularity = providers.Singleton(
+        PopularityRanking,
+        size=config.POPULARITY_SIZE,
+        refresh_seconds=config.POPULARITY_REFRESH_SECONDS,
     )
 
     # Services (создаются для каждого запроса)
@@ -39,6 +116,11 @@ class Container(containers.DeclarativeContainer):
         model=recsys_model,
         user_repository=user_repository,
         track_repository=track_repository,
+        recommendation_queues=recommendation_queues,
+        exclusions=exclusions,
+        popularity=popularity,
+        recommendation_repository=recommendation_repository,
+        batch_max_age=config.BATCH_RECOMMENDATIONS_MAX_AGE,
     )
 
     track_service = providers.Factory(
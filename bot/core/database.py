@@ -1,4 +1,6 @@
-from typing import AsyncGenerator, Any
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, AsyncIterator, Any
 from sqlalchemy import MetaData
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
@@ -22,6 +24,48 @@ async_session_factory = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Сессия unit of work текущего апдейта (см. unit_of_work)
+_current_session: ContextVar[AsyncSession | None] = ContextVar("current_session", default=None)
+
+
+def current_session() -> AsyncSession | None:
+    return _current_session.get()
+
+
+def get_session() -> AsyncSession:
+    """Сессия текущего unit of work или новая (вне апдейта: скрипты, on_startup)"""
+    return _current_session.get() or async_session_factory()
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    Одна сессия на апдейт: все репозитории внутри делят ее и одно
+    подключение из пула. Обработчик коммитит через commit_unit_of_work,
+    как только закончил работу с БД; в конце коммитится то, что осталось
+    """
+    session = async_session_factory()
+    token = _current_session.set(session)
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        _current_session.reset(token)
+        await session.close()
+
+
+async def commit_unit_of_work() -> None:
+    """
+    Коммитит изменения апдейта сразу, до запросов к Telegram: подключение
+    возвращается в пул, а ошибка отправки ответа уже не откатит записанное
+    """
+    session = _current_session.get()
+    if session is not None:
+        await session.commit()
+
 
 async def database_shutdown():
     logger.info("Closing database...")
@@ -3,6 +3,8 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 
+from core.database import unit_of_work
+
 
 class ContainerMiddleware(BaseMiddleware):
     """Middleware для инъекции DI контейнера в обработчики"""
@@ -20,3 +22,20 @@ class ContainerMiddleware(BaseMiddleware):
         # Добавляем контейнер в данные
         data["container"] = self.container
         return await handler(event, data)
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """
+    Middleware, открывающий одну сессию БД на апдейт: все репозитории,
+    созданные в обработчике, работают в ней. Обработчики коммитят
+    (commit_unit_of_work) до ответа в Telegram, здесь досохраняется остальное
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with unit_of_work():
+            return await handler(event, data)
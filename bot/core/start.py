@@ -1,6 +1,7 @@
 from aiogram import Dispatcher, Bot
 from loguru import logger
 
+from core.container import Container
 from core.database import database_shutdown
 from handler import start_router, audioplayer_router
 
@@ -12,21 +13,30 @@ def setup_handlers(dp: Dispatcher) -> None:
     logger.info("Handlers registered successfully")
 
 
-async def on_startup(bot: Bot) -> None:
+async def on_startup(bot: Bot, container: Container) -> None:
     """Действия при запуске бота"""
     logger.info("Bot is starting...")
+    # Модель грузится в фоне, бот отвечает на апдейты сразу
+    container.recsys_model().start()
+    # Каталог треков - в память в фоне, дальше перечитывается только при изменениях
+    container.track_catalog().start()
+    # Рейтинг популярности для холодного старта - агрегирующий запрос в фоне
+    container.popularity().start(container.user_repository().get_interaction_counts)
     bot_info = await bot.get_me()
     logger.info(f"Bot @{bot_info.username} started successfully")
 
 
-async def on_shutdown(bot: Bot) -> None:
+async def on_shutdown(bot: Bot, container: Container) -> None:
     """Действия при остановке бота"""
     logger.info("Bot is shutting down...")
+    container.recsys_model().shutdown()
+    container.popularity().shutdown()
+    await container.track_catalog().shutdown()
     await database_shutdown()
     await bot.session.close()
 
 
-async def start(dp: Dispatcher, bot: Bot) -> None:
+async def start(dp: Dispatcher, bot: Bot, container: Container) -> None:
     """Запуск бота с подключением обработчиков"""
     # Регистрация обработчиков
     setup_handlers(dp)
@@ -36,4 +46,8 @@ async def start(dp: Dispatcher, bot: Bot) -> None:
 
     # Запуск polling
     logger.info("Starting polling...")
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    await dp.start_polling(
+        bot,
+        container=container,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
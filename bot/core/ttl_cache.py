@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Tuple, TypeVar
+
+from loguru import logger
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    LRU-кэш с ограничением времени жизни записей и счетчиками попаданий.
+
+    Статистика пишется в лог раз в LOG_EVERY обращений под именем name.
+    Блокировка нужна кэшам, которые читаются из потоков инференса;
+    в event loop она ничего не стоит.
+    """
+
+    LOG_EVERY = 1000
+
+    def __init__(self, name: str, capacity: int, ttl_seconds: float):
+        self.name = name
+        self.capacity = capacity
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: OrderedDict[K, Tuple[V, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            if (self.hits + self.misses) % self.LOG_EVERY == 0:
+                logger.info(f"{self.name}: {self.stats()}")
+            return entry[0] if entry is not None else None
+
+    def put(self, key: K, value: V) -> V:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
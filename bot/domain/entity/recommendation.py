@@ -0,0 +1,15 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Tuple
+
+
+@dataclass
+class Recommendation:
+    """top-K, заранее посчитанный офлайн-задачей (scripts/batch_recommend.py)"""
+
+    user_id: int
+    track_paths: List[str]
+    # id последних лайкнутых треков, для которых посчитан top-K
+    context: Tuple[int, ...]
+    model_version: str
+    created_at: datetime = field(default_factory=datetime.now)
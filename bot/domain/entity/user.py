@@ -1,8 +1,10 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
+from domain.entity.track import Track
+
 
 @dataclass
 class User:
@@ -18,3 +20,15 @@ class InteractionAction(str, Enum):
     skip = "skip"
     like = "like"
     dislike = "dislike"
+
+
+@dataclass
+class InteractionResult:
+    """Записанное взаимодействие и то, что нужно для следующей рекомендации"""
+
+    user_id: int
+    favorite_music_genre: Optional[str]
+    # Путь к треку, с которым было взаимодействие
+    track_path: str
+    # Последние лайки пользователя от старых к новым (с только что записанным)
+    recent_likes: List[Track] = field(default_factory=list)
@@ -16,11 +16,13 @@ class UserServiceProtocol(Protocol):
 
     async def get_liked_tracks(self, user_id: int) -> List[Track]: ...
 
+    async def get_recent_liked_tracks(self, user_id: int, n: int = 3) -> List[Track]: ...
+
     async def get_disliked_tracks(self, user_id: int) -> List[Track]: ...
 
     async def handle_user_interaction(
         self, telegram_id: int, track_id: int, interaction_type: InteractionAction
-    ) -> Track: ...
+    ) -> Track | None: ...
 
 
 class TrackServiceProtocol(Protocol): 
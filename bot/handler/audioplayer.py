@@ -7,6 +7,7 @@ from aiogram.enums import ParseMode
 from loguru import logger
 
 from core.container import Container
+from core.database import commit_unit_of_work
 from handler._keyboards import create_player_keyboard
 from domain.entity.user import InteractionAction
 
@@ -109,11 +110,14 @@ async def handle_player_action(callback: CallbackQuery, state: FSMContext, conta
                     track_id=track.id,
                     interaction_type=interaction_action
                 )
+                # Лайк сохраняется до ответа и отправки следующего трека
+                await commit_unit_of_work()
                 
+                warming_up = "" if container.recsys_model().ready else "\n⏳ Рекомендации еще загружаются"
                 if action == 'like':
-                    await callback.answer("❤️ Лайк сохранен!")
+                    await callback.answer(f"❤️ Лайк сохранен!{warming_up}")
                 else:
-                    await callback.answer("💔 Дизлайк сохранен!")
+                    await callback.answer(f"💔 Дизлайк сохранен!{warming_up}")
                     
         except Exception as e:
             logger.error(f"Ошибка сохранения взаимодействия: {e}")
@@ -150,12 +154,14 @@ async def cmd_liked(message: Message, container: Container):
         
         try:
             user = await user_service.get_by_telegram_id(message.from_user.id)
+            liked_tracks = (
+                await user_service.get_recent_liked_tracks(user.id, n=10) if user else []
+            )
+            await commit_unit_of_work()
             if user:
-                liked_tracks = await user_service.get_liked_tracks(user.id)
-                
                 if liked_tracks:
                     response = "❤️ <b>Вам понравились:</b>\n\n"
-                    for i, track in enumerate(liked_tracks[:10], 1):
+                    for i, track in enumerate(liked_tracks, 1):
                         response += f"{i}. {track.title}\n"
                     await message.answer(response, parse_mode=ParseMode.HTML)
                 else:
@@ -182,9 +188,9 @@ async def cmd_disliked(message: Message, container: Container):
         
         try:
             user = await user_service.get_by_telegram_id(message.from_user.id)
+            disliked_tracks = await user_service.get_disliked_tracks(user.id) if user else []
+            await commit_unit_of_work()
             if user:
-                disliked_tracks = await user_service.get_disliked_tracks(user.id)
-                
                 if disliked_tracks:
                     response = "💔 <b>Вам не понравились:</b>\n\n"
                     for i, track in enumerate(disliked_tracks[:10], 1):
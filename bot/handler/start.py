@@ -5,6 +5,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from core.container import Container
+from core.database import commit_unit_of_work
 from domain.entity.user import User
 from handler._keyboards import (
     create_empty_keyboard,
@@ -29,6 +30,7 @@ async def cmd_start(message: Message, state: FSMContext, container: Container):
 
     # Проверяем, есть ли пользователь
     existing_user = await user_service.get_by_telegram_id(message.from_user.id)
+    await commit_unit_of_work()
 
     if existing_user:
         # Пользователь уже есть - показываем команды
@@ -126,6 +128,7 @@ async def handle_genre(
         )
 
         created_user = await user_service.create(user)
+        await commit_unit_of_work()
         print(f"Пользователь создан: {created_user}")
 
     except Exception as e:
@@ -6,7 +6,7 @@ from aiogram.enums import ParseMode
 from core.config import settings
 from core.start import start
 from core.container import Container
-from core.middleware import ContainerMiddleware
+from core.middleware import ContainerMiddleware, UnitOfWorkMiddleware
 
 
 async def main():
@@ -26,7 +26,11 @@ async def main():
     dp.message.middleware(ContainerMiddleware(container))
     dp.callback_query.middleware(ContainerMiddleware(container))
 
-    await start(dp, bot)
+    # Одна сессия БД на апдейт
+    dp.message.middleware(UnitOfWorkMiddleware())
+    dp.callback_query.middleware(UnitOfWorkMiddleware())
+
+    await start(dp, bot, container)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import torch
+from loguru import logger
+
+from recsys.search import EmbeddingSearch
+
+
+class IVFSearch(EmbeddingSearch):
+    """
+    Приближенный поиск ближайших треков (IVF).
+
+    Каталог разбивается сферическим k-means на n_lists кластеров, запрос
+    скорится только по трекам из nprobe ближайших кластеров. nprobe задает
+    баланс между полнотой и скоростью: nprobe == n_lists - это точный поиск.
+    Разбиение сохраняется в index_path и пересчитывается, только если
+    поменялись эмбеддинги.
+    """
+
+    TRAIN_POINTS_PER_LIST = 256
+    ASSIGN_CHUNK = 65536
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        matrix: torch.Tensor,
+        n_lists: int = 0,
+        nprobe: int = 8,
+        n_iter: int = 20,
+        index_path: str | Path | None = None,
+        normalized: bool = False,
+    ):
+        super().__init__(ids, matrix, normalized=normalized)
+        self.n_lists = n_lists or max(1, int(4 * np.sqrt(len(self.ids))))
+        self.n_lists = min(self.n_lists, max(1, len(self.ids)))
+        self.nprobe = max(1, min(nprobe, self.n_lists))
+        self.fingerprint = self._fingerprint()
+
+        if index_path is not None and self._load(Path(index_path)):
+            logger.info(f"IVF index loaded from {index_path}: {self.n_lists} lists")
+            return
+
+        self._train(n_iter)
+        if index_path is not None:
+            self._save(Path(index_path))
+            logger.info(f"IVF index built and saved to {index_path}: {self.n_lists} lists")
+
+    @property
+    def exact(self) -> bool:
+        # При частичном пробе короткая выдача - это кончившиеся кластеры, а не каталог
+        return self.nprobe >= self.n_lists
+
+    def top_k_batch(
+        self,
+        query_embs: torch.Tensor,
+        k: int = 1,
+        exclude_ids: Sequence[Iterable[int] | None] | None = None,
+        exclude_mask: torch.Tensor | None = None,
+    ) -> List[List[int]]:
+        query_embs = query_embs.float()
+        query_embs = query_embs / query_embs.norm(dim=-1, keepdim=True).clamp_min(self.EPS)
+        probes = torch.topk(query_embs @ self.centroids.T, self.nprobe, dim=1).indices
+        exclude_ids = list(exclude_ids or [])
+
+        results = []
+        for i, (query, lists) in enumerate(zip(query_embs, probes.tolist())):
+            rows = torch.cat(
+                [self.list_rows[self.list_offsets[l] : self.list_offsets[l + 1]] for l in lists]
+            )
+            scores = self.matrix[rows] @ query
+
+            excluded = torch.zeros(len(rows), dtype=torch.bool)
+            if exclude_mask is not None:
+                mask = exclude_mask[i] if exclude_mask.dim() == 2 else exclude_mask
+                excluded |= mask[rows]
+            if i < len(exclude_ids) and exclude_ids[i]:
+                excluded |= torch.isin(rows, torch.tensor(self.rows(exclude_ids[i]), dtype=torch.long))
+            scores = scores.masked_fill(excluded, -float("inf"))
+
+            count = min(k, int(torch.isfinite(scores).sum()))
+            if count <= 0:
+                results.append([])
+                continue
+            top = torch.topk(scores, count).indices
+            results.append([int(self.ids[row]) for row in rows[top].tolist()])
+        return results
+
+    def _fingerprint(self) -> str:
+        step = max(1, len(self.ids) // 1024)
+        digest = hashlib.sha1(self.ids.tobytes())
+        digest.update(self.matrix[::step].numpy().tobytes())
+        return digest.hexdigest()
+
+    def _train(self, n_iter: int) -> None:
+        generator = torch.Generator().manual_seed(0)
+        n_train = min(len(self.ids), self.n_lists * self.TRAIN_POINTS_PER_LIST)
+        sample = self.matrix[torch.randperm(len(self.ids), generator=generator)[:n_train]]
+
+        centroids = sample[torch.randperm(n_train, generator=generator)[: self.n_lists]].clone()
+        for _ in range(n_iter):
+            assign = torch.argmax(sample @ centroids.T, dim=1)
+            sums = torch.zeros_like(centroids).index_add_(0, assign, sample)
+            counts = torch.bincount(assign, minlength=self.n_lists)
+            empty = counts == 0
+            if empty.any():
+                # Пустые кластеры перезапускаем со случайных точек
+                refill = torch.randint(n_train, (int(empty.sum()),), generator=generator)
+                sums[empty] = sample[refill]
+            centroids = sums / sums.norm(dim=1, keepdim=True).clamp_min(self.EPS)
+
+        assign = torch.cat(
+            [
+                torch.argmax(self.matrix[start : start + self.ASSIGN_CHUNK] @ centroids.T, dim=1)
+                for start in range(0, len(self.ids), self.ASSIGN_CHUNK)
+            ]
+        )
+        self.centroids = centroids.contiguous()
+        self.list_rows = torch.argsort(assign, stable=True)
+        counts = torch.bincount(assign, minlength=self.n_lists)
+        self.list_offsets = [0] + torch.cumsum(counts, dim=0).tolist()
+
+    def _save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Свой временный файл у каждого процесса: воркеры обучают индекс одновременно
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                fingerprint=np.array(self.fingerprint),
+                centroids=self.centroids.numpy(),
+                list_rows=self.list_rows.numpy(),
+                list_offsets=np.asarray(self.list_offsets, dtype=np.int64),
+            )
+        os.replace(tmp_path, path)
+
+    def _load(self, path: Path) -> bool:
+        if not path.exists():
+            return False
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != self.fingerprint:
+                logger.warning(f"IVF index {path} is stale, rebuilding")
+                return False
+            centroids = data["centroids"]
+            if len(centroids) != self.n_lists:
+                logger.warning(f"IVF index {path} has {len(centroids)} lists, rebuilding")
+                return False
+            self.centroids = torch.from_numpy(centroids)
+            self.list_rows = torch.from_numpy(data["list_rows"])
+            self.list_offsets = data["list_offsets"].tolist()
+        return True
+
+
+def build_search(
+    ids: np.ndarray,
+    matrix: torch.Tensor,
+    kind: str = "exact",
+    normalized: bool = False,
+    **ann_kwargs,
+) -> EmbeddingSearch:
+    """
+    Создает точный (exact) или приближенный (ivf) поиск по эмбеддингам.
+    Параметры IVFSearch для точного поиска игнорируются.
+    """
+    if kind == "exact":
+        return EmbeddingSearch(ids, matrix, normalized=normalized)
+    if kind == "ivf":
+        return IVFSearch(ids, matrix, normalized=normalized, **ann_kwargs)
+    raise ValueError(f"Unknown search kind: {kind}")
@@ -0,0 +1,167 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+class ArrayStore:
+    """
+    Дисковое хранилище массивов одинаковой формы, ключ - track_id.
+
+    Данные лежат в одном файле записями фиксированного размера и читаются
+    через memmap, рядом хранится индекс track_id в порядке записей.
+    Хвост файла без записи в индексе (после падения) считается мусором
+    и перезаписывается при следующем добавлении.
+
+    Писать в одно хранилище могут несколько процессов (воркеры модели,
+    populate_tracks.py): добавление идет под файловой блокировкой и
+    начинается с перечитывания индекса, а чтение при промахе подхватывает
+    записи других процессов.
+    """
+
+    DATA_FILE = "data.bin"
+    INDEX_FILE = "index.npy"
+    META_FILE = "meta.json"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, root: str | Path, shape: Tuple[int, ...], dtype=np.float16):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.record_size = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        self._data_path = self.root / self.DATA_FILE
+        self._index_path = self.root / self.INDEX_FILE
+        self._lock_path = self.root / self.LOCK_FILE
+        self._lock = threading.Lock()
+        self._offsets: Dict[int, int] = {}
+        self._ids: list[int] = []
+        self._index_mtime: int | None = None
+        self._mmap: np.memmap | None = None
+
+        with self._file_lock():
+            self._check_meta()
+            self._reload_index()
+        logger.info(f"Array store {self.root}: {len(self._ids)} records {self.shape}")
+
+    @classmethod
+    def read_meta(cls, root: str | Path) -> Tuple[Tuple[int, ...], np.dtype] | None:
+        """Форма и тип записей уже созданного хранилища или None"""
+        meta_path = Path(root) / cls.META_FILE
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        return tuple(meta["shape"]), np.dtype(meta["dtype"])
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, track_id: int) -> bool:
+        return track_id in self._offsets
+
+    def ids(self) -> list[int]:
+        return list(self._ids)
+
+    def get(self, track_id: int) -> np.ndarray | None:
+        """Возвращает запись (только чтение) или None"""
+        row = self._offsets.get(track_id)
+        if row is None:
+            # Запись мог добавить другой процесс
+            with self._lock:
+                self._reload_index()
+            row = self._offsets.get(track_id)
+            if row is None:
+                return None
+        with self._lock:
+            if self._mmap is None or self._mmap.shape[0] <= row:
+                self._remap()
+            return self._mmap[row]
+
+    def put(self, track_id: int, array: np.ndarray) -> None:
+        self.put_many([(track_id, array)])
+
+    def put_many(self, items: Iterable[Tuple[int, np.ndarray]]) -> None:
+        """Дописывает записи в конец файла и сохраняет индекс"""
+        with self._lock, self._file_lock():
+            # Пока блокировка была у других процессов, они могли дописать записи
+            self._reload_index()
+            new_ids = []
+            with open(self._data_path, "ab") as f:
+                f.truncate(len(self._ids) * self.record_size)
+                f.seek(0, os.SEEK_END)
+                for track_id, array in items:
+                    if track_id in self._offsets or track_id in new_ids:
+                        continue
+                    if array.shape != self.shape:
+                        raise ValueError(
+                            f"Array shape {array.shape} != {self.shape} for track {track_id}"
+                        )
+                    f.write(np.ascontiguousarray(array, dtype=self.dtype).tobytes())
+                    new_ids.append(track_id)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if not new_ids:
+                return
+
+            start = len(self._ids)
+            self._ids.extend(new_ids)
+            self._save_index()
+            for row, track_id in enumerate(new_ids, start):
+                self._offsets[track_id] = row
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Межпроцессная блокировка хранилища"""
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _reload_index(self) -> None:
+        """Перечитывает индекс с диска, если его переписал другой процесс"""
+        try:
+            mtime = self._index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+        self._ids = [int(tid) for tid in np.load(self._index_path)]
+        self._offsets = {tid: row for row, tid in enumerate(self._ids)}
+        self._index_mtime = mtime
+
+    def _check_meta(self) -> None:
+        meta = self.read_meta(self.root)
+        if meta is None:
+            (self.root / self.META_FILE).write_text(
+                json.dumps({"shape": list(self.shape), "dtype": self.dtype.str})
+            )
+            return
+        shape, dtype = meta
+        if shape != self.shape or dtype != self.dtype:
+            raise ValueError(
+                f"Store {self.root} holds {shape} {dtype}, requested {self.shape} {self.dtype}"
+            )
+
+    def _save_index(self) -> None:
+        tmp_path = self._index_path.with_suffix(".tmp.npy")
+        np.save(tmp_path, np.asarray(self._ids, dtype=np.int64))
+        os.replace(tmp_path, self._index_path)
+        self._index_mtime = self._index_path.stat().st_mtime_ns
+
+    def _remap(self) -> None:
+        self._mmap = np.memmap(
+            self._data_path,
+            dtype=self.dtype,
+            mode="r",
+            shape=(len(self._ids), *self.shape),
+        )
@@ -0,0 +1,47 @@
+import hashlib
+import os
+from pathlib import Path
+
+# Режимы инференса: исходная модель, TorchScript и TorchScript + int8
+INFERENCE_MODES = ("eager", "torchscript", "int8")
+
+
+def optimized_model_path(model_path: str | Path, mode: str) -> Path:
+    """recommender_model.pkl -> recommender_model.<mode>.pt"""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}.{mode}.pt")
+
+
+def weights_path(model_path: str | Path, inference_mode: str) -> Path:
+    """Файл весов для режима инференса (исходная модель, если оптимизированной нет)"""
+    if inference_mode != "eager":
+        optimized = optimized_model_path(model_path, inference_mode)
+        if optimized.exists():
+            return optimized
+    return Path(model_path)
+
+
+def artifacts_version(*paths: str | Path) -> str:
+    """Версия набора артефактов модели по размеру и времени изменения файлов"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def model_version(
+    model_path: str | Path,
+    embeddings_parquet: str | Path,
+    audio_features_parquet: str | Path,
+    inference_mode: str = "eager",
+) -> str:
+    """
+    Версия, под которой RecommendationModel загрузит эти артефакты.
+
+    Считается без импорта torch, поэтому подходит для проверки на новые
+    артефакты из event loop.
+    """
+    return artifacts_version(
+        weights_path(model_path, inference_mode), embeddings_parquet, audio_features_parquet
+    )
@@ -0,0 +1,122 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+from domain.entity.track import Track
+from recsys.errors import RecommenderOverloaded
+
+
+@dataclass(frozen=True)
+class PredictionRequest:
+    likes: List[Track]
+    k: int = 1
+    # Упакованная маска исключений по строкам каталога (ExclusionBitmaps)
+    exclude: np.ndarray | None = None
+    # Любимый жанр пользователя из анкеты
+    genre: str | None = None
+
+
+class InferenceBatcher:
+    """
+    Собирает одновременные запросы PredictionRequest в пачки.
+
+    Пачка отправляется в модель, когда набралось max_batch_size запросов
+    или прошло max_wait_ms с первого из них. Очередь ограничена: при
+    переполнении новый запрос сразу получает RecommenderOverloaded,
+    а не ждет в хвосте.
+
+    Если пачка падает (например, на битом mp3 одного пользователя), ее
+    запросы пересчитываются по одному, и ошибку получает только тот,
+    на котором она воспроизводится.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[PredictionRequest]], Awaitable[List[List[str]]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5,
+        max_queue_size: int = 256,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.shed = 0
+        self._queue: asyncio.Queue[Tuple[PredictionRequest, asyncio.Future]] | None = None
+        self._collector: asyncio.Task | None = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def submit(self, request: PredictionRequest) -> List[str]:
+        if self._collector is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._collector = asyncio.create_task(self._collect())
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((request, future))
+        except asyncio.QueueFull:
+            self.shed += 1
+            raise RecommenderOverloaded(
+                f"Recommendation queue is full ({self.max_queue_size})"
+            )
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(request, future) for request, future in batch if not future.done()]
+            if not batch:
+                continue
+            # Следующая пачка собирается, пока эта считается
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(
+        self, batch: List[Tuple[PredictionRequest, asyncio.Future]]
+    ) -> None:
+        try:
+            results = await self.run_batch([request for request, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Prediction failed: {e}")
+                self._resolve(batch[0][1], e)
+                return
+            logger.warning(
+                f"Batched prediction failed for {len(batch)} requests, retrying one by one: {e}"
+            )
+            await asyncio.gather(*(self._dispatch([item]) for item in batch))
+            return
+
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: List[str] | BaseException) -> None:
+        if future.done():
+            return
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+    def shutdown(self) -> None:
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
+        for task in self._dispatches:
+            task.cancel()
@@ -0,0 +1,164 @@
+import os
+import resource
+import time
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+
+def rss_mb() -> float:
+    """Текущий resident set процесса в МБ"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Нет /proc (macOS) - берем пиковое значение
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+class EmbeddingTable:
+    """
+    Таблица track_id -> вектор в виде двух непрерывных массивов.
+
+    ids отсортированы, строка находится бинарным поиском. Матрица может быть
+    float16 и отображаться в память из .npy, поэтому загрузка не создает
+    по объекту на трек.
+    """
+
+    NORMALIZE_CHUNK = 65536
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray):
+        if len(ids) != len(matrix):
+            raise ValueError(f"ids and matrix size mismatch: {len(ids)} != {len(matrix)}")
+        order = np.argsort(ids, kind="stable")
+        if np.any(order != np.arange(len(ids))):
+            ids, matrix = ids[order], matrix[order]
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.matrix = matrix
+
+    @classmethod
+    def from_parquet(cls, path: str | Path, dtype=np.float32) -> "EmbeddingTable":
+        """Первая колонка parquet - track_id, остальные - компоненты вектора"""
+        df = pd.read_parquet(path)
+        ids = df["track_id"].to_numpy(dtype=np.int64)
+        matrix = np.ascontiguousarray(df.iloc[:, 1:].to_numpy(dtype=dtype))
+        return cls(ids, matrix)
+
+    @classmethod
+    def load(
+        cls, parquet_path: str | Path, dtype=np.float32, mmap: bool = True
+    ) -> "EmbeddingTable":
+        """
+        Загружает таблицу из .npy рядом с parquet, при необходимости
+        конвертирует parquet в .npy
+
+        Args:
+            parquet_path: Путь к исходному parquet
+            dtype: Тип матрицы (float32 или float16)
+            mmap: Отображать матрицу в память вместо чтения целиком
+        """
+        started = time.perf_counter()
+        rss_before = rss_mb()
+
+        parquet_path = Path(parquet_path)
+        dtype = np.dtype(dtype)
+        ids_path = parquet_path.with_suffix(".ids.npy")
+        matrix_path = parquet_path.with_suffix(f".{dtype.name}.npy")
+
+        fresh = (
+            ids_path.exists()
+            and matrix_path.exists()
+            and matrix_path.stat().st_mtime >= parquet_path.stat().st_mtime
+        )
+        if fresh:
+            table = cls(
+                np.load(ids_path),
+                np.load(matrix_path, mmap_mode="r" if mmap else None),
+            )
+        else:
+            table = cls.from_parquet(parquet_path, dtype=dtype)
+            table.save(ids_path, matrix_path)
+            if mmap:
+                table.matrix = np.load(matrix_path, mmap_mode="r")
+
+        logger.info(
+            f"Embedding table {parquet_path.name}: {len(table)} x {table.dim} {dtype.name}"
+            f"{' (mmap)' if mmap else ''}, loaded in {time.perf_counter() - started:.2f}s, "
+            f"RSS +{rss_mb() - rss_before:.1f} MB"
+        )
+        return table
+
+    def save(self, ids_path: Path, matrix_path: Path) -> None:
+        for path, array in ((ids_path, self.ids), (matrix_path, self.matrix)):
+            # Воркеры стартуют одновременно и конвертируют одно и то же
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+
+    def normalized(self, path: str | Path, source: str | Path) -> np.ndarray:
+        """
+        L2-нормированная float32 матрица для поиска, отображенная в память
+        только для чтения. Файл пишется один раз (кусками, без полной копии
+        в памяти), после этого все процессы-воркеры делят его страницы
+        через page cache.
+
+        Args:
+            path: Куда сохранить нормированную матрицу (.npy)
+            source: Исходный parquet - файл пересчитывается, если он новее
+        """
+        path = Path(path)
+        fresh = path.exists() and path.stat().st_mtime >= Path(source).stat().st_mtime
+        if fresh:
+            matrix = np.load(path, mmap_mode="r")
+            if matrix.shape == (len(self), self.dim) and matrix.dtype == np.float32:
+                return matrix
+
+        started = time.perf_counter()
+        # Свой временный файл у каждого процесса: воркеры могут стартовать одновременно
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        out = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(len(self), self.dim)
+        )
+        for start in range(0, len(self), self.NORMALIZE_CHUNK):
+            chunk = np.asarray(self.matrix[start : start + self.NORMALIZE_CHUNK], dtype=np.float32)
+            norms = np.maximum(np.linalg.norm(chunk, axis=1, keepdims=True), 1e-8)
+            out[start : start + len(chunk)] = chunk / norms
+        out.flush()
+        del out
+        os.replace(tmp_path, path)
+        logger.info(f"Normalized matrix {path.name} written in {time.perf_counter() - started:.2f}s")
+        return np.load(path, mmap_mode="r")
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1] if self.matrix.ndim > 1 else 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, track_id: int) -> int | None:
+        """Номер строки трека или None"""
+        row = int(np.searchsorted(self.ids, track_id))
+        if row < len(self.ids) and self.ids[row] == track_id:
+            return row
+        return None
+
+    def rows(self, track_ids: Iterable[int]) -> np.ndarray:
+        """Номера строк для известных track_id (неизвестные пропускаются)"""
+        track_ids = np.fromiter((tid for tid in track_ids if tid is not None), dtype=np.int64)
+        rows = np.searchsorted(self.ids, track_ids)
+        rows = np.minimum(rows, max(len(self.ids) - 1, 0))
+        return rows[self.ids[rows] == track_ids] if len(self.ids) else rows[:0]
+
+    def __contains__(self, track_id: int) -> bool:
+        return self.row(track_id) is not None
+
+    def __getitem__(self, track_id: int) -> np.ndarray:
+        row = self.row(track_id)
+        if row is None:
+            raise KeyError(track_id)
+        return self.matrix[row]
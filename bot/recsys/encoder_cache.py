@@ -0,0 +1,65 @@
+import threading
+from pathlib import Path
+from typing import Iterable, Tuple
+
+import numpy as np
+import torch
+
+from recsys.array_store import ArrayStore
+
+
+def supports_encoder_split(model) -> bool:
+    """
+    Модель умеет считать аудио-энкодер отдельно от головы последовательности:
+    encode(mel, meta) -> (N, H) и aggregate(encoded) -> (N, D),
+    где aggregate(encode(mel, meta)) == forward(mel, meta).
+    """
+    return callable(getattr(model, "encode", None)) and callable(
+        getattr(model, "aggregate", None)
+    )
+
+
+class EncoderCache:
+    """
+    Кэш выходов аудио-энкодера по track_id.
+
+    Выход энкодера зависит только от трека, поэтому считается один раз
+    (офлайн скриптом scripts/encode_tracks.py или лениво при первом лайке)
+    и хранится на диске в ArrayStore. Векторы читаются прямо из mmap
+    хранилища, поэтому процессы-воркеры делят одни страницы page cache
+    и не держат собственных копий.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._store: ArrayStore | None = None
+        self._lock = threading.Lock()
+
+        meta = ArrayStore.read_meta(self.root)
+        if meta is not None:
+            shape, dtype = meta
+            self._store = ArrayStore(self.root, shape=shape, dtype=dtype)
+
+    def __len__(self) -> int:
+        return len(self._store) if self._store is not None else 0
+
+    def __contains__(self, track_id: int) -> bool:
+        return self._store is not None and self._store.get(track_id) is not None
+
+    def get(self, track_id: int) -> torch.Tensor | None:
+        row = self._store.get(track_id) if self._store is not None else None
+        if row is None:
+            return None
+        # Копия одного вектора: mmap только для чтения, а torch ждет записываемый массив
+        return torch.from_numpy(np.array(row, dtype=np.float32))
+
+    def put_many(self, items: Iterable[Tuple[int, torch.Tensor]]) -> None:
+        items = [(track_id, vector.detach().float().cpu()) for track_id, vector in items]
+        if not items:
+            return
+        with self._lock:
+            if self._store is None:
+                self._store = ArrayStore(
+                    self.root, shape=tuple(items[0][1].shape), dtype=np.float32
+                )
+            self._store.put_many((track_id, vector.numpy()) for track_id, vector in items)
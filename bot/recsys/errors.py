@@ -0,0 +1,10 @@
+class RecommenderUnavailable(Exception):
+    """Рекомендацию сейчас получить нельзя, взаимодействие при этом не теряется"""
+
+
+class RecommenderOverloaded(RecommenderUnavailable):
+    """Очередь предсказаний переполнена - запрос отброшен"""
+
+
+class RecommenderNotReady(RecommenderUnavailable):
+    """Модель еще загружается"""
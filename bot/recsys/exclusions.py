@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+import numpy as np
+
+
+class ExclusionBitmaps:
+    """
+    Треки, с которыми пользователь уже взаимодействовал, в виде битовой
+    маски по строкам каталога модели (N / 8 байт на пользователя).
+
+    Маска загружается из БД один раз при первом взаимодействии, дальше
+    обновляется по одному биту. Каталог (отсортированные FMA id) задает
+    модель после загрузки; при смене каталога маски сбрасываются.
+    """
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self.catalog_ids: np.ndarray | None = None
+        self._bitmaps: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bind_catalog(self, catalog_ids: np.ndarray) -> None:
+        catalog_ids = np.asarray(catalog_ids, dtype=np.int64)
+        with self._lock:
+            if self.catalog_ids is not None and np.array_equal(self.catalog_ids, catalog_ids):
+                return
+            self.catalog_ids = catalog_ids
+            self._bitmaps.clear()
+
+    def has(self, user_id: int) -> bool:
+        return self.catalog_ids is not None and user_id in self._bitmaps
+
+    def load(self, user_id: int, track_ids: Iterable[int]) -> None:
+        """Полная маска пользователя (FMA id всех его треков)"""
+        if self.catalog_ids is None:
+            return
+        mask = np.zeros(len(self.catalog_ids), dtype=bool)
+        mask[self._rows(track_ids)] = True
+        with self._lock:
+            self._bitmaps[user_id] = np.packbits(mask)
+            self._bitmaps.move_to_end(user_id)
+            while len(self._bitmaps) > self.max_users:
+                self._bitmaps.popitem(last=False)
+
+    def add(self, user_id: int, track_id: int | None) -> None:
+        """Добавляет один трек в уже загруженную маску"""
+        with self._lock:
+            bitmap = self._bitmaps.get(user_id)
+            if bitmap is None or track_id is None:
+                return
+            for row in self._rows([track_id]):
+                bitmap[row >> 3] |= np.uint8(0x80 >> (row & 7))
+            self._bitmaps.move_to_end(user_id)
+
+    def contains(self, user_id: int, track_id: int) -> bool:
+        """Был ли трек у пользователя (False, если маска не загружена)"""
+        bitmap = self._bitmaps.get(user_id)
+        if bitmap is None:
+            return False
+        rows = self._rows([track_id])
+        return bool(len(rows)) and bool(bitmap[rows[0] >> 3] & (0x80 >> (rows[0] & 7)))
+
+    def get(self, user_id: int) -> np.ndarray | None:
+        """Упакованная маска (np.packbits) или None"""
+        return self._bitmaps.get(user_id)
+
+    def _rows(self, track_ids: Iterable[int]) -> np.ndarray:
+        ids = np.fromiter((tid for tid in track_ids if tid is not None), dtype=np.int64)
+        if len(self.catalog_ids) == 0:
+            return ids[:0]
+        rows = np.minimum(np.searchsorted(self.catalog_ids, ids), len(self.catalog_ids) - 1)
+        return rows[self.catalog_ids[rows] == ids]
+
+
+def unpack_exclusions(bitmap: np.ndarray | None, size: int) -> np.ndarray:
+    """Упакованная маска -> bool массив длины size (пустая маска для None)"""
+    if bitmap is None:
+        return np.zeros(size, dtype=bool)
+    mask = np.unpackbits(bitmap, count=min(size, len(bitmap) * 8)).astype(bool)
+    if len(mask) < size:
+        mask = np.concatenate([mask, np.zeros(size - len(mask), dtype=bool)])
+    return mask
@@ -0,0 +1,339 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from loguru import logger
+
+from domain.entity.track import Track
+from recsys.artifacts import model_version
+from recsys.batcher import InferenceBatcher, PredictionRequest
+from recsys.errors import RecommenderNotReady
+from recsys.exclusions import ExclusionBitmaps
+
+# torch, librosa и pandas импортируются только при загрузке модели,
+# чтобы бот начинал принимать апдейты сразу
+if TYPE_CHECKING:
+    import numpy as np
+
+    from recsys.model import RecommendationModel
+
+# Модель внутри процесса-воркера (режим "process")
+_worker_model: "RecommendationModel | None" = None
+
+
+def configure_torch_threads(num_threads: int) -> None:
+    """Ограничивает intra-op потоки torch, чтобы воркеры не дрались за ядра"""
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # inter-op пул уже запущен - менять его можно только до первой операции
+        pass
+
+
+def _init_worker(model_kwargs: Dict[str, Any], torch_threads: int) -> None:
+    from recsys.model import RecommendationModel
+
+    global _worker_model
+    configure_torch_threads(torch_threads)
+    _worker_model = RecommendationModel(**model_kwargs)
+    _worker_model.warm_up()
+
+
+def _worker_catalog() -> Tuple[str, "np.ndarray"]:
+    return _worker_model.version, _worker_model.search.ids
+
+
+def _worker_pick_top_k_batch(
+    likes_batch: List[List[Track]],
+    k: int,
+    exclusions: List["np.ndarray | None"],
+    genres: List[str | None],
+) -> Tuple[str, List[List[str]]]:
+    return _worker_model.version, _worker_model.pick_top_k_batch(
+        likes_batch, k, exclusions, genres
+    )
+
+
+class AsyncRecommender:
+    """
+    Асинхронная обертка над RecommendationModel.
+
+    Инференс выполняется в пуле потоков или процессов, поэтому не блокирует
+    event loop бота, а семафор ограничивает число одновременных предсказаний.
+    Одновременные запросы склеиваются в пачки через InferenceBatcher.
+    Модель загружается в фоне (start), до этого pick_next сразу
+    отвечает RecommenderNotReady.
+
+    Раз в reload_interval секунд проверяется версия артефактов на диске.
+    Новая версия загружается и прогревается рядом со старой, после чего
+    ссылка на модель (или пул процессов) подменяется целиком: уже начатые
+    пачки досчитываются старой версией, следующие идут в новую.
+    """
+
+    def __init__(
+        self,
+        model_kwargs: Dict[str, Any] | None = None,
+        executor: str = "thread",
+        workers: int = 1,
+        max_concurrency: int = 4,
+        torch_threads: int = 0,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5,
+        max_queue_size: int = 256,
+        exclusions: ExclusionBitmaps | None = None,
+        reload_interval: float = 0,
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown recsys executor: {executor}")
+
+        self.model_kwargs = model_kwargs or {}
+        self.mode = executor
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        # В режиме "process" одновременных пачек не меньше, чем процессов,
+        # иначе часть ядер простаивает
+        self._semaphore = asyncio.Semaphore(
+            max(max_concurrency, self.workers) if executor == "process" else max_concurrency
+        )
+        self._executor: Executor | None = None
+        self._model: "RecommendationModel | None" = None
+        self._model_lock = threading.Lock()
+        self._loading: asyncio.Task | None = None
+        self._watcher: asyncio.Task | None = None
+        self._reload_lock = asyncio.Lock()
+        self.reload_interval = reload_interval
+        self.ready = False
+        self.version: str | None = None
+        # Сколько запросов ответила каждая версия модели
+        self.answered: Counter[str] = Counter()
+        self.exclusions = exclusions
+        self.batcher = InferenceBatcher(
+            self._run_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_queue_size=max_queue_size,
+        )
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._create_executor()
+            logger.info(
+                f"Recsys executor: {self.mode} x{self.workers}, torch threads: {self.torch_threads}"
+            )
+        return self._executor
+
+    def _create_executor(self) -> Executor:
+        if self.mode == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_kwargs, self.torch_threads),
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="recsys",
+            initializer=configure_torch_threads,
+            initargs=(self.torch_threads,),
+        )
+
+    @property
+    def model(self) -> "RecommendationModel":
+        """Модель для режима "thread" (загружается при первом обращении)"""
+        from recsys.model import RecommendationModel
+
+        with self._model_lock:
+            if self._model is None:
+                self._model = RecommendationModel(**self.model_kwargs)
+                self._model.warm_up()
+            return self._model
+
+    def start(self) -> None:
+        """Запускает фоновую загрузку модели"""
+        if self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+
+    async def _load(self) -> None:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            if self.mode == "process":
+                version, catalog_ids = await self._wait_workers(self.executor)
+            else:
+                model = await loop.run_in_executor(self.executor, lambda: self.model)
+                version, catalog_ids = model.version, model.search.ids
+        except Exception as e:
+            logger.exception(f"Recommendation model failed to load: {e}")
+            return
+        if self.exclusions is not None:
+            self.exclusions.bind_catalog(catalog_ids)
+        self.version = version
+        self.ready = True
+        logger.info(
+            f"Recommendation model {version} ready in {time.perf_counter() - started:.1f}s"
+        )
+        if self.reload_interval > 0:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _wait_workers(self, executor: Executor) -> Tuple[str, "np.ndarray"]:
+        """Ждет, пока инициализатор загрузит и прогреет модель в процессах пула"""
+        loop = asyncio.get_running_loop()
+        catalogs = await asyncio.gather(
+            *(loop.run_in_executor(executor, _worker_catalog) for _ in range(self.workers))
+        )
+        return catalogs[0]
+
+    def artifacts_version(self) -> str:
+        """Версия артефактов, которые сейчас лежат на диске"""
+        return model_version(
+            self.model_kwargs.get("model_path", "recommender_model.pkl"),
+            self.model_kwargs.get("embeddings_parquet", "after_model_parquet.parquet"),
+            self.model_kwargs.get("audio_features_parquet", "audio_features.parquet"),
+            self.model_kwargs.get("inference_mode", "eager"),
+        )
+
+    async def _watch(self) -> None:
+        # Перезагружаемся, только когда версия на диске не менялась целый
+        # интервал, чтобы не подхватить недописанный файл
+        pending = None
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                version = await asyncio.to_thread(self.artifacts_version)
+            except OSError as e:
+                logger.warning(f"Model artifacts are not readable: {e}")
+                pending = None
+                continue
+            if version == self.version:
+                pending = None
+            elif version == pending:
+                await self.reload()
+                pending = None
+            else:
+                pending = version
+
+    async def reload(self) -> bool:
+        """
+        Загружает артефакты заново и атомарно подменяет ими текущую модель
+
+        Returns:
+            True, если новая версия начала отвечать на запросы
+        """
+        async with self._reload_lock:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            logger.info(f"Reloading recommendation model (current {self.version})")
+            try:
+                if self.mode == "process":
+                    # Новый пул поднимается рядом со старым, пока тот отвечает
+                    executor = self._create_executor()
+                    try:
+                        version, catalog_ids = await self._wait_workers(executor)
+                    except BaseException:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise
+                else:
+                    # Загрузка идет в отдельном потоке, воркеры пула продолжают отвечать
+                    from recsys.model import RecommendationModel
+
+                    current = self._model
+
+                    def load() -> "RecommendationModel":
+                        model = RecommendationModel(
+                            **self.model_kwargs,
+                            mel_cache=current.mel_cache if current is not None else None,
+                        )
+                        model.warm_up()
+                        return model
+
+                    model = await loop.run_in_executor(None, load)
+                    version, catalog_ids = model.version, model.search.ids
+            except Exception as e:
+                logger.exception(f"Recommendation model reload failed, keeping {self.version}: {e}")
+                return False
+
+            if self.mode == "process":
+                # Начатые задачи старый пул досчитывает, новые уходят в новый
+                previous, self._executor = self._executor, executor
+                if previous is not None:
+                    previous.shutdown(wait=False)
+            else:
+                with self._model_lock:
+                    self._model = model
+
+            if self.exclusions is not None:
+                self.exclusions.bind_catalog(catalog_ids)
+            logger.info(
+                f"Recommendation model {self.version} -> {version} "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+            self.version = version
+            return True
+
+    async def pick_next(self, likes: List[Track]) -> str:
+        paths = await self.pick_top_k(likes, 1)
+        return paths[0] if paths else None
+
+    async def pick_top_k(
+        self,
+        likes: List[Track],
+        k: int,
+        exclude: "np.ndarray | None" = None,
+        genre: str | None = None,
+    ) -> List[str]:
+        """
+        До k следующих треков за один проход модели
+
+        Args:
+            likes: Лайкнутые треки пользователя
+            k: Сколько треков вернуть
+            exclude: Упакованная маска исключений из ExclusionBitmaps
+            genre: Любимый жанр пользователя (для предфильтра кандидатов)
+        """
+        if not self.ready:
+            raise RecommenderNotReady("Recommendation model is warming up")
+        return await self.batcher.submit(PredictionRequest(likes, k, exclude, genre))
+
+    async def _run_batch(self, requests: List[PredictionRequest]) -> List[List[str]]:
+        loop = asyncio.get_running_loop()
+        likes_batch = [request.likes for request in requests]
+        exclusions = [request.exclude for request in requests]
+        genres = [request.genre for request in requests]
+        k = max(request.k for request in requests)
+        async with self._semaphore:
+            if self.mode == "process":
+                version, results = await loop.run_in_executor(
+                    self.executor, _worker_pick_top_k_batch, likes_batch, k, exclusions, genres
+                )
+            else:
+
+                def predict() -> Tuple[str, List[List[str]]]:
+                    # Ссылка берется один раз: перезагрузка не подменит модель посреди пачки
+                    model = self.model
+                    return model.version, model.pick_top_k_batch(
+                        likes_batch, k, exclusions, genres
+                    )
+
+                version, results = await loop.run_in_executor(self.executor, predict)
+        self.answered[version] += len(requests)
+        logger.debug(f"{len(requests)} predictions answered by model {version}")
+        return [paths[: request.k] for paths, request in zip(results, requests)]
+
+    def shutdown(self) -> None:
+        if self._loading is not None:
+            self._loading.cancel()
+        if self._watcher is not None:
+            self._watcher.cancel()
+        self.batcher.shutdown()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
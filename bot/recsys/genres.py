@@ -0,0 +1,45 @@
+from pathlib import Path
+from typing import Dict
+
+import pandas as pd
+
+# Жанры из анкеты (handler/start.py) -> genre_top в метаданных FMA.
+# Метал в FMA - поджанр рока; "смешанный" жанр ничего не ограничивает
+USER_GENRE_TO_FMA: Dict[str, str | None] = {
+    "рок": "Rock",
+    "поп": "Pop",
+    "классика": "Classical",
+    "электроника": "Electronic",
+    "хип-хоп": "Hip-Hop",
+    "джаз": "Jazz",
+    "метал": "Rock",
+    "смешанный": None,
+}
+
+
+def fma_genre(user_genre: str | None) -> str | None:
+    """Жанр FMA для жанра из анкеты пользователя (None - без ограничения)"""
+    if user_genre is None:
+        return None
+    return USER_GENRE_TO_FMA.get(user_genre.lower())
+
+
+def load_track_genres(path: str | Path) -> Dict[int, str]:
+    """
+    Жанры треков: колонка genre_top по track_id. Читается как
+    fma_metadata/tracks.csv в исходном виде (двухуровневый заголовок,
+    track_id - индекс), так и плоский csv/parquet с колонками track_id, genre_top
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+        if "genre_top" not in df.columns:
+            # Исходный tracks.csv: колонка ("track", "genre_top"), индекс - track_id
+            fma = pd.read_csv(path, index_col=0, header=[0, 1])
+            df = pd.DataFrame(
+                {"track_id": fma.index, "genre_top": fma[("track", "genre_top")].to_numpy()}
+            )
+    df = df.dropna(subset=["genre_top"])
+    return dict(zip(df["track_id"].astype(int), df["genre_top"].astype(str)))
@@ -0,0 +1,14 @@
+import re
+
+MP3_PATTERN = re.compile(r"(\d+)\.mp3$", re.IGNORECASE)
+
+
+def extract_track_id_from_filename(filename: str) -> int | None:
+    """
+    '000002.mp3' -> 2
+    Returns None if filename doesn't match expected pattern.
+    """
+    m = MP3_PATTERN.search(filename)
+    if not m:
+        return None
+    return int(m.group(1)) 
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from recsys.array_store import ArrayStore
+
+
+class MelStore(ArrayStore):
+    """Хранилище мел-спектрограмм фиксированной длины (float16)"""
+
+    DATA_FILE = "mels.f16"
+    DTYPE = np.float16
+
+    def __init__(self, root: str | Path, n_mels: int = 128, target_len: int = 1300):
+        super().__init__(root, shape=(n_mels, target_len), dtype=self.DTYPE)
+
+
+class MelCache:
+    """
+    Небольшой LRU-кэш спектрограмм в памяти поверх MelStore.
+
+    Основной кэш - mmap хранилища в page cache, общий для всех процессов,
+    поэтому в LRU лежат только самые горячие треки и в float16, как
+    в хранилище (128 x 1300 x 2 байта = 325 КБ на трек)
+    """
+
+    def __init__(self, store: MelStore | None = None, capacity: int = 64):
+        self.store = store
+        self.capacity = capacity
+        self._lru: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get_many(
+        self,
+        tracks: Sequence[Tuple[int, str]],
+        compute_many: Callable[[List[str]], np.ndarray],
+        out: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Спектрограммы пачки треков в буфер out; все промахи считаются
+        одним вызовом compute_many
+
+        Args:
+            tracks: Пары (FMA id, путь к MP3 файлу)
+            compute_many: Пачка путей -> массив (M, n_mels, T)
+            out: Буфер (N, n_mels, T) float32
+        """
+        # track_id -> строки out (трек может повторяться в пачке)
+        missing: Dict[int, List[int]] = {}
+        paths: Dict[int, str] = {}
+        with self._lock:
+            for row, (track_id, path) in enumerate(tracks):
+                mel = self._lru.get(track_id)
+                if mel is not None:
+                    self._lru.move_to_end(track_id)
+                    self.hits += 1
+                    out[row] = mel
+                else:
+                    missing.setdefault(track_id, []).append(row)
+                    paths[track_id] = path
+
+        for track_id in list(missing):
+            stored = self.store.get(track_id) if self.store is not None else None
+            if stored is not None:
+                rows = missing.pop(track_id)
+                out[rows] = stored
+                self.store_hits += 1
+                self._remember(track_id, stored)
+
+        if missing:
+            track_ids = list(missing)
+            mels = compute_many([paths[track_id] for track_id in track_ids])
+            self.misses += len(track_ids)
+            for track_id, mel in zip(track_ids, mels):
+                out[missing[track_id]] = mel
+                self._remember(track_id, mel)
+            if self.store is not None:
+                self.store.put_many(zip(track_ids, mels))
+        return out
+
+    def _remember(self, track_id: int, mel: np.ndarray) -> None:
+        if self.capacity <= 0:
+            return
+        mel = np.asarray(mel, dtype=MelStore.DTYPE)
+        with self._lock:
+            self._lru[track_id] = mel
+            self._lru.move_to_end(track_id)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
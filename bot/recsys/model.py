@@ -1,14 +1,30 @@
 from typing import List
-import random
 from domain.entity.track import Track
 import torch
-import torch.nn.functional as F
 import pickle
-import pandas as pd
 import numpy as np
 import librosa
-import re
+import zipfile
+import time
+import warnings
+from pathlib import Path
 
+from recsys.ids import extract_track_id_from_filename
+from recsys.search import EmbeddingSearch
+from recsys.ann import build_search
+from recsys.embedding_table import EmbeddingTable
+from recsys.mel_cache import MelStore, MelCache
+from recsys.frontend import MelFrontend
+from recsys.encoder_cache import EncoderCache, supports_encoder_split
+from recsys.exclusions import unpack_exclusions
+from recsys.prediction_cache import PredictionCache
+from recsys.prefilter import CandidateFilter, feature_columns
+from recsys.genres import load_track_genres
+from recsys.artifacts import INFERENCE_MODES, artifacts_version, weights_path
+from recsys.optimize import load_optimized
+from loguru import logger
+
+# Эталонный расчет по одному файлу; модель считает спектрограммы пачкой через MelFrontend
 def load_mel(path, sr=22050, n_mels=128, duration=30):
     y, sr = librosa.load(path, sr=sr, duration=duration)
     mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=n_mels)
@@ -24,82 +40,328 @@ def fix_length(mel, target_len=1300):
         return np.concatenate([mel, pad], axis=1)
     return mel
 
-def recommend_similar(query_emb: torch.Tensor, track_embeddings: dict, exclude_ids=None):
+def recommend_similar(query_emb: torch.Tensor, search: EmbeddingSearch, exclude_ids=None):
     """Находим ближайший трек по косинусной схожести"""
-    exclude_ids = exclude_ids or []
-    best_id = None
-    best_sim = -float('inf')
-    for tid, emb in track_embeddings.items():
-        if tid in exclude_ids:
-            continue
-        sim = F.cosine_similarity(query_emb, emb, dim=0).item()
-        if sim > best_sim:
-            best_sim = sim
-            best_id = tid
-    return best_id
-
-def extract_track_id_from_filename(filename: str) -> int | None:
+    best = search.top_k(query_emb, k=1, exclude_ids=exclude_ids)
+    return best[0] if best else None
+
+def load_model(model_path: str):
     """
-    '000002.mp3' -> 2
-    Returns None if filename doesn't match expected pattern.
+    Загружает модель. Файлы torch.save читаются через mmap - веса не
+    копируются в память целиком, обычный pickle читается как раньше.
     """
-    MP3_PATTERN = re.compile(r"(\d+)\.mp3$", re.IGNORECASE)
-    m = MP3_PATTERN.search(filename)
-    if not m:
-        return None
-    return int(m.group(1)) 
+    if zipfile.is_zipfile(model_path):
+        return torch.load(model_path, map_location="cpu", mmap=True, weights_only=False)
+    with open(model_path, "rb") as f:
+        return pickle.load(f)
 
 class RecommendationModel:
-    def __init__(self, model_path="recommender_model.pkl", embeddings_parquet="after_model_parquet.parquet"):
-        with open(model_path, "rb") as f:
-            self.model = pickle.load(f)
-        self.model.eval()
+    def __init__(
+        self,
+        model_path="recommender_model.pkl",
+        embeddings_parquet="after_model_parquet.parquet",
+        audio_features_parquet="audio_features.parquet",
+        embeddings_dtype="float32",
+        embeddings_mmap=True,
+        mel_store_dir="mel_store",
+        mel_cache_size=64,
+        encoder_cache_dir="encoder_cache",
+        search_kind="exact",
+        ann_n_lists=0,
+        ann_nprobe=8,
+        ann_index_path="ann_index/ivf.npz",
+        prediction_cache_size=4096,
+        prediction_cache_ttl=3600,
+        prediction_cache_candidates=50,
+        inference_mode="eager",
+        mel_cache: MelCache | None = None,
+        prefilter_enabled=False,
+        prefilter_features="",
+        prefilter_buckets=8,
+        prefilter_min_candidates=2000,
+        track_genres_path="",
+    ):
+        if inference_mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode: {inference_mode}")
+        weights = weights_path(model_path, inference_mode)
+        if inference_mode != "eager" and weights == Path(model_path):
+            logger.warning(
+                f"No {inference_mode} model next to {model_path}, "
+                f"run scripts/optimize_model.py; falling back to eager"
+            )
+            inference_mode = "eager"
+        self.inference_mode = inference_mode
 
-        df = pd.read_parquet(embeddings_parquet)
-        self.track_embeddings = {
-            int(row.track_id): torch.tensor(row[2:], dtype=torch.float32)
-            for row in df.itertuples()
-        }
+        self.version = artifacts_version(weights, embeddings_parquet, audio_features_parquet)
+        if inference_mode == "eager":
+            self.model = load_model(model_path)
+        else:
+            self.model = load_optimized(model_path, inference_mode)
+        self.model.eval()
+        logger.info(f"Recommendation model {self.version} loaded, inference mode: {inference_mode}")
 
-        audio_features = pd.read_parquet(audio_features.parquet)
-        self.track_embeddings_features = {
-            int(row.track_id): torch.tensor(row[2:], dtype=torch.float32)
-            for row in audio_features.itertuples()
-        }
+        self.track_embeddings = EmbeddingTable.load(
+            embeddings_parquet, dtype=embeddings_dtype, mmap=embeddings_mmap
+        )
+        self.track_embeddings_features = EmbeddingTable.load(
+            audio_features_parquet, dtype=embeddings_dtype, mmap=embeddings_mmap
+        )
 
+        # Нормированная матрица поиска - общий для воркеров файл в page cache,
+        # а не приватная копия в каждом процессе
+        search_matrix = self.track_embeddings.normalized(
+            Path(embeddings_parquet).with_suffix(".normalized.npy"), source=embeddings_parquet
+        )
+        with warnings.catch_warnings():
+            # Матрица только для чтения, поиск ее не изменяет
+            warnings.filterwarnings("ignore", message=".*non-writable.*")
+            search_matrix = torch.from_numpy(search_matrix)
+        self.search = build_search(
+            self.track_embeddings.ids,
+            search_matrix,
+            kind=search_kind,
+            normalized=True,
+            n_lists=ann_n_lists,
+            nprobe=ann_nprobe,
+            index_path=ann_index_path,
+        )
 
         self.TARGET_LEN = 1300  
+        self.frontend = MelFrontend(target_len=self.TARGET_LEN)
+        # Спектрограммы от модели не зависят: при перезагрузке кэш передается
+        # новой модели, чтобы в одно хранилище не писали два экземпляра
+        self.mel_cache = mel_cache or MelCache(
+            MelStore(mel_store_dir, target_len=self.TARGET_LEN),
+            capacity=mel_cache_size,
+        )
+
+        self.split_encoder = supports_encoder_split(self.model)
+        # Выходы энкодера зависят от весов, режима инференса и аудио-признаков,
+        # но не от эмбеддингов каталога
+        self.encoder_cache = (
+            EncoderCache(Path(encoder_cache_dir) / artifacts_version(weights, audio_features_parquet))
+            if self.split_encoder
+            else None
+        )
+        if self.split_encoder:
+            logger.info(f"Encoder cache: {len(self.encoder_cache)} tracks encoded")
+        else:
+            logger.warning("Model has no encode/aggregate split, running full forward pass")
+
+        self.prediction_cache = PredictionCache(
+            capacity=prediction_cache_size, ttl_seconds=prediction_cache_ttl
+        )
+        self.cache_candidates = prediction_cache_candidates
+
+        self.prefilter = None
+        if prefilter_enabled:
+            names = [name.strip() for name in prefilter_features.split(",") if name.strip()]
+            self.prefilter = CandidateFilter(
+                self.search.ids,
+                self.track_embeddings_features,
+                columns=feature_columns(audio_features_parquet, names),
+                n_buckets=prefilter_buckets,
+                track_genres=load_track_genres(track_genres_path) if track_genres_path else None,
+                min_candidates=prefilter_min_candidates,
+            )
 
     def pick_next(self, likes: List[Track]) -> str:
-        next_track_id = self.__predict(likes)
-        return self.__build_path(next_track_id)
+        return self.pick_next_batch([likes])[0]
+
+    def pick_next_batch(self, likes_batch: List[List[Track]]) -> List[str]:
+        """pick_next для нескольких пользователей за один проход"""
+        return [paths[0] if paths else None for paths in self.pick_top_k_batch(likes_batch, k=1)]
+
+    def pick_top_k_batch(
+        self,
+        likes_batch: List[List[Track]],
+        k: int,
+        exclusions: List[np.ndarray | None] | None = None,
+        genres: List[str | None] | None = None,
+    ) -> List[List[str]]:
+        """
+        До k следующих треков для каждого пользователя за один проход модели
+
+        Args:
+            likes_batch: Лайкнутые треки каждого пользователя
+            k: Сколько треков вернуть на пользователя
+            exclusions: Упакованные маски исключений по строкам каталога
+            genres: Любимые жанры пользователей (для предфильтра кандидатов)
+        """
+        # Без лайков предсказывать не по чему - такие запросы обслуживает
+        # холодный старт в UserService, здесь они просто получают пустой ответ
+        active = [i for i, likes in enumerate(likes_batch) if likes]
+        results: List[List[str]] = [[] for _ in likes_batch]
+        if not active:
+            return results
+        predicted = self.__predict(
+            [likes_batch[i] for i in active],
+            k,
+            [exclusions[i] for i in active] if exclusions else None,
+            [genres[i] for i in active] if genres else None,
+        )
+        for i, track_ids in zip(active, predicted):
+            results[i] = [self.__build_path(track_id) for track_id in track_ids]
+        return results
 
-    def __predict(self, likes: List[Track]) -> int:
+    def warm_up(self) -> None:
+        """
+        Тестовое предсказание до того, как модель начнет отвечать: прогревает
+        поиск, страницы mmap и (если в хранилище есть спектрограммы) модель
+        """
+        started = time.perf_counter()
+        self.search.top_k(self.search.matrix[0], k=1)
+        stored = [
+            track_id
+            for track_id in (self.mel_cache.store.ids() if self.mel_cache.store is not None else [])
+            if track_id in self.track_embeddings_features
+        ][:3]
+        if len(stored) == 3:
+            likes = [Track(track_id, "", "", 0, "", self.__build_path(track_id)) for track_id in stored]
+            self.pick_next(likes)
+        logger.info(f"Recommendation model {self.version} warmed up in {time.perf_counter() - started:.2f}s")
+
+    def __predict(
+        self,
+        likes_batch: List[List[Track]],
+        k: int = 1,
+        exclusions: List[np.ndarray | None] | None = None,
+        genres: List[str | None] | None = None,
+    ) -> List[List[int]]:
         """Используем трансформер для последовательности последних треков"""
-        last_tracks = likes[-3:] 
-        
-        mel_seq = []
-        meta_seq = []
-
-        for track in last_tracks:
-            track_id = extract_track_id_from_filename(track.id)
-            mel = fix_length(load_mel(track.local_path), self.TARGET_LEN)
-            mel_seq.append(mel)
-
-            emb = self.track_embeddings_features[track_id] 
-            meta_seq.append(emb)
-            
-        mel_tensor = torch.from_numpy(np.stack(mel_seq)).float().unsqueeze(1)  
-        meta_tensor = torch.tensor(np.stack(meta_seq), dtype=torch.float32)     
+        requests = [
+            [
+                (extract_track_id_from_filename(track.local_path), track.local_path)
+                for track in likes[-3:]
+            ]
+            for likes in likes_batch
+        ]
+
+        keys = [tuple(track_id for track_id, _ in tracks) for tracks in requests]
+        genres = genres or [None] * len(requests)
+        # С предфильтром кандидаты зависят еще и от жанра пользователя
+        cache_keys = [
+            key + (genre,) if self.prefilter is not None else key
+            for key, genre in zip(keys, genres)
+        ]
+
+        cached = [self.prediction_cache.get(key) for key in cache_keys]
+        missing = [i for i, entry in enumerate(cached) if entry is None]
+        if missing:
+            query_embs = self.__query_embeddings([requests[i] for i in missing])
+            n_candidates = max(k, self.cache_candidates)
+            if self.prefilter is None:
+                candidate_rows = [None] * len(missing)
+                candidates = self.search.top_k_batch(
+                    query_embs, k=n_candidates, exclude_ids=[keys[i] for i in missing]
+                )
+            else:
+                started = time.perf_counter()
+                candidate_rows = [self.prefilter.candidates(keys[i], genres[i]) for i in missing]
+                filtered = time.perf_counter()
+                candidates = self.search.top_k_candidates(
+                    query_embs, candidate_rows, k=n_candidates, exclude_ids=[keys[i] for i in missing]
+                )
+                self.prefilter.record(
+                    candidate_rows,
+                    filter_ms=(filtered - started) * 1000,
+                    search_ms=(time.perf_counter() - filtered) * 1000,
+                )
+            for row, i in enumerate(missing):
+                cached[i] = self.prediction_cache.put(
+                    cache_keys[i],
+                    query_embs[row],
+                    candidates[row],
+                    # Суженная выборка (предфильтр или частичный проб IVF) не
+                    # исчерпывает каталог: если кандидатов не хватит, поиск повторится
+                    exhaustive=candidate_rows[row] is None
+                    and self.search.exact
+                    and len(candidates[row]) < n_candidates,
+                )
+
+        # Персональные исключения накладываются на кэшированных кандидатов,
+        # поиск повторяется, только если после фильтрации их не хватило
+        results: List[List[int]] = [[] for _ in requests]
+        rescore = []
+        masks = [
+            unpack_exclusions(exclusions[i], len(self.search))
+            if exclusions and exclusions[i] is not None
+            else None
+            for i in range(len(requests))
+        ]
+        for i, entry in enumerate(cached):
+            candidates = entry.candidates
+            if masks[i] is not None:
+                rows = self.search.rows(candidates)
+                candidates = [tid for tid, row in zip(candidates, rows) if not masks[i][row]]
+            if len(candidates) >= k or entry.exhaustive:
+                results[i] = candidates[:k]
+            else:
+                rescore.append(i)
+
+        if rescore:
+            found = self.search.top_k_batch(
+                torch.stack([cached[i].query_emb for i in rescore]),
+                k=k,
+                exclude_ids=[keys[i] for i in rescore],
+                exclude_mask=torch.from_numpy(
+                    np.stack(
+                        [
+                            masks[i] if masks[i] is not None else unpack_exclusions(None, len(self.search))
+                            for i in rescore
+                        ]
+                    )
+                ),
+            )
+            for i, track_ids in zip(rescore, found):
+                results[i] = track_ids
+        return results
 
+    def __query_embeddings(self, requests: List[List[tuple[int, str]]]) -> torch.Tensor:
+        """Нормированные эмбеддинги запросов (B, D) по последовательностям треков"""
         with torch.no_grad():
-            pred_emb = self.model.forward(mel_tensor, meta_tensor)  
-        pred_emb = pred_emb[-1] 
-        pred_emb = pred_emb / (pred_emb.norm() + 1e-9)  
+            if self.split_encoder:
+                # Энкодер считается один раз на трек и одной пачкой на все запросы,
+                # на запрос остается только голова
+                self.__encode_missing([track for tracks in requests for track in tracks])
+                pred_embs = [
+                    self.model.aggregate(
+                        torch.stack([self.encoder_cache.get(track_id) for track_id, _ in tracks])
+                    )[-1]
+                    for tracks in requests
+                ]
+            else:
+                pred_embs = [
+                    self.model.forward(*self.__build_inputs(tracks))[-1]
+                    for tracks in requests
+                ]
+        pred_embs = torch.stack(pred_embs)
+        return pred_embs / (pred_embs.norm(dim=1, keepdim=True) + 1e-9)
+
+    def encode_tracks(self, tracks: List[tuple[int, str]]) -> torch.Tensor:
+        """Выходы аудио-энкодера для пачки треков (track_id, путь к mp3)"""
+        with torch.no_grad():
+            return self.model.encode(*self.__build_inputs(tracks))
+
+    def __encode_missing(self, tracks: List[tuple[int, str]]) -> None:
+        missing = list(
+            {track_id: path for track_id, path in tracks if track_id not in self.encoder_cache}.items()
+        )
+        if missing:
+            encoded = self.encode_tracks(missing)
+            self.encoder_cache.put_many(
+                (track_id, vector) for (track_id, _), vector in zip(missing, encoded)
+            )
+
+    def __build_inputs(self, tracks: List[tuple[int, str]]) -> tuple[torch.Tensor, torch.Tensor]:
+        # Спектрограммы пишутся сразу во входной тензор модели,
+        # промахи кэша считаются одной пачкой
+        mel_tensor = torch.empty((len(tracks), 1, self.frontend.n_mels, self.TARGET_LEN))
+        self.mel_cache.get_many(tracks, self.frontend.load, out=mel_tensor.numpy()[:, 0])
 
-        exclude_ids = [extract_track_id_from_filename(track.id) for track in last_tracks]  
-        next_track_id = recommend_similar(pred_emb, self.track_embeddings, exclude_ids)
-        return next_track_id
+        meta_seq = [self.track_embeddings_features[track_id] for track_id, _ in tracks]
+        meta_tensor = torch.from_numpy(np.stack(meta_seq).astype(np.float32))
+        return mel_tensor, meta_tensor
 
     @staticmethod
     def __build_path(track_id: int) -> str:
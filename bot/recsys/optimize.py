@@ -0,0 +1,110 @@
+from pathlib import Path
+from typing import Set, Tuple
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from recsys.artifacts import optimized_model_path
+from recsys.encoder_cache import supports_encoder_split
+
+
+# Слои, которые читают .weight своих линейных подмодулей напрямую (быстрый
+# путь трансформера, F.multi_head_attention_forward). У динамически
+# квантизованного Linear .weight - метод, и первый же проход падает
+_READS_LINEAR_WEIGHTS = (
+    nn.MultiheadAttention,
+    nn.TransformerEncoderLayer,
+    nn.TransformerDecoderLayer,
+)
+
+# Допустимое расхождение трассированной модели с исходной на примере входа
+MAX_TRACE_DRIFT = 1e-3
+
+
+def quantizable_linears(model: nn.Module) -> Set[str]:
+    """Имена nn.Linear, которые можно квантизовать, не ломая владеющий ими слой"""
+    skipped = {
+        f"{owner_name}.{name}" if owner_name else name
+        for owner_name, owner in model.named_modules()
+        if isinstance(owner, _READS_LINEAR_WEIGHTS)
+        for name, module in owner.named_modules()
+        if isinstance(module, nn.Linear)
+    }
+    return {
+        name
+        for name, module in model.named_modules()
+        if isinstance(module, nn.Linear) and name not in skipped
+    }
+
+
+def quantize(model: nn.Module) -> nn.Module:
+    """
+    Динамическая int8-квантизация линейных слоев вне трансформерных блоков.
+    Линейные слои внутри nn.TransformerEncoderLayer / nn.MultiheadAttention
+    и свертки остаются в fp32
+    """
+    names = quantizable_linears(model)
+    if not names:
+        raise ValueError("Model has no linear layers that can be quantized")
+    return torch.ao.quantization.quantize_dynamic(
+        model,
+        {name: torch.ao.quantization.default_dynamic_qconfig for name in names},
+        dtype=torch.qint8,
+    )
+
+
+def cosine_drift(reference: torch.Tensor, optimized: torch.Tensor) -> torch.Tensor:
+    """1 - косинусная схожесть выходов по строкам"""
+    return 1 - F.cosine_similarity(reference.float(), optimized.float(), dim=-1)
+
+
+def export(
+    model: nn.Module, example_inputs: Tuple[torch.Tensor, torch.Tensor], mode: str
+) -> torch.jit.ScriptModule:
+    """
+    Трассирует модель в TorchScript (для int8 - после квантизации) и
+    проверяет, что трассированная модель на примере входа дает те же
+    эмбеддинги, что и исходная (для int8 - что и квантизованная)
+
+    Args:
+        model: Исходная модель в режиме eval
+        example_inputs: Пример (mel_tensor, meta_tensor)
+        mode: "torchscript" или "int8"
+    """
+    if mode not in ("torchscript", "int8"):
+        raise ValueError(f"Unknown export mode: {mode}")
+
+    model = model.eval()
+    if mode == "int8":
+        model = quantize(model)
+
+    split = supports_encoder_split(model)
+    with torch.no_grad():
+        # Прямой проход до трассировки: несовместимый с квантизацией слой
+        # падает здесь с понятной ошибкой, а не внутри trace
+        expected = model(*example_inputs)
+        if split:
+            # Сохраняем раздельные encode/aggregate для кэша энкодера
+            encoded = model.encode(*example_inputs)
+            traced = torch.jit.trace_module(
+                model,
+                {
+                    "forward": example_inputs,
+                    "encode": example_inputs,
+                    "aggregate": (encoded,),
+                },
+            )
+        else:
+            traced = torch.jit.trace(model, example_inputs)
+        frozen = torch.jit.freeze(
+            traced.eval(), preserved_attrs=["encode", "aggregate"] if split else None
+        )
+        drift = float(cosine_drift(expected, frozen(*example_inputs)).max())
+    if drift > MAX_TRACE_DRIFT:
+        raise RuntimeError(f"Traced {mode} model diverges from eager model: drift {drift:.2e}")
+    return frozen
+
+
+def load_optimized(model_path: str | Path, mode: str) -> torch.jit.ScriptModule:
+    return torch.jit.load(str(optimized_model_path(model_path, mode)), map_location="cpu")
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import torch
+from core.ttl_cache import TTLCache
+
+# Ключ - FMA id последних лайкнутых треков (и жанр пользователя, если
+# включен предфильтр кандидатов)
+ContextKey = Tuple[int | str | None, ...]
+
+
+@dataclass(frozen=True)
+class CachedPrediction:
+    query_emb: torch.Tensor
+    # Ближайшие треки без учета персональных исключений
+    candidates: List[int]
+    # candidates - весь доступный каталог, дальше искать нечего
+    exhaustive: bool
+
+
+class PredictionCache(TTLCache[ContextKey, CachedPrediction]):
+    """
+    LRU/TTL-кэш предсказаний модели по контексту (последним лайкам).
+
+    Контекст не зависит от пользователя, поэтому популярные тройки треков
+    переиспользуются между пользователями; персональные исключения
+    накладываются уже после чтения из кэша. Кэш принадлежит экземпляру
+    модели, поэтому новая версия модели начинает с пустого кэша.
+    """
+
+    def __init__(self, capacity: int = 4096, ttl_seconds: float = 3600):
+        super().__init__("Prediction cache", capacity, ttl_seconds)
+
+    def put(
+        self, key: ContextKey, query_emb: torch.Tensor, candidates: List[int], exhaustive: bool
+    ) -> CachedPrediction:
+        return super().put(key, CachedPrediction(query_emb, candidates, exhaustive))
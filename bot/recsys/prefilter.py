@@ -0,0 +1,142 @@
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import pyarrow.parquet as pq
+from loguru import logger
+
+from recsys.embedding_table import EmbeddingTable
+from recsys.genres import fma_genre
+
+
+def feature_columns(parquet_path: str | Path, names: Iterable[str]) -> List[int]:
+    """Номера компонент вектора аудио-признаков по именам колонок parquet"""
+    # Первая колонка parquet - track_id, в вектор она не входит
+    columns = pq.read_schema(parquet_path).names[1:]
+    missing = [name for name in names if name not in columns]
+    if missing:
+        raise ValueError(f"{parquet_path} has no feature columns {missing}")
+    return [columns.index(name) for name in names]
+
+
+class CandidateFilter:
+    """
+    Сужение каталога до скоринга эмбеддингов.
+
+    Для каждой выбранной аудио-характеристики (темп, энергия и т.п.) каталог
+    делится на n_buckets квантильных корзин, для жанров строятся свои
+    списки; каждый список - отсортированные номера строк каталога поиска.
+    Кандидаты запроса - пересечение корзин лайкнутых треков (с соседними
+    корзинами) и жанра пользователя. Ограничение, после которого остается
+    меньше min_candidates треков, пропускается, а None означает поиск по
+    всему каталогу.
+    """
+
+    LOG_EVERY = 1000
+
+    def __init__(
+        self,
+        catalog_ids: np.ndarray,
+        features: EmbeddingTable,
+        columns: Sequence[int] = (),
+        n_buckets: int = 8,
+        widen: int = 1,
+        track_genres: Dict[int, str] | None = None,
+        min_candidates: int = 2000,
+    ):
+        self.catalog_size = len(catalog_ids)
+        self.features = features
+        self.columns = list(columns)
+        self.n_buckets = n_buckets
+        self.widen = widen
+        self.min_candidates = min_candidates
+
+        positions = np.minimum(np.searchsorted(features.ids, catalog_ids), max(len(features) - 1, 0))
+        known = features.ids[positions] == catalog_ids if len(features) else np.zeros(0, dtype=bool)
+
+        # Треки без признаков попадают в любую выборку - отсеять их не по чему
+        self.unknown_rows = np.flatnonzero(~known)
+        self.edges: List[np.ndarray] = []
+        self.bucket_rows: List[List[np.ndarray]] = []
+        for column in self.columns:
+            values = np.asarray(features.matrix[positions[known], column], dtype=np.float32)
+            edges = np.quantile(values, np.linspace(0, 1, n_buckets + 1)[1:-1])
+            buckets = np.full(self.catalog_size, -1, dtype=np.int16)
+            buckets[known] = np.searchsorted(edges, values, side="right")
+            self.edges.append(edges)
+            self.bucket_rows.append([np.flatnonzero(buckets == bucket) for bucket in range(n_buckets)])
+
+        self.genre_rows: Dict[str, np.ndarray] = {}
+        if track_genres:
+            genres = np.array([track_genres.get(int(tid), "") for tid in catalog_ids], dtype=object)
+            for genre in set(genres) - {""}:
+                self.genre_rows[genre] = np.flatnonzero(genres == genre)
+
+        self.requests = 0
+        self.narrowed = 0
+        self.scored = 0
+        self.filter_ms = 0.0
+        self.search_ms = 0.0
+        self._lock = threading.Lock()
+        logger.info(
+            f"Candidate filter: {len(self.columns)} features x {n_buckets} buckets, "
+            f"{len(self.genre_rows)} genres"
+        )
+
+    def candidates(self, liked_ids: Sequence[int], user_genre: str | None = None) -> np.ndarray | None:
+        """
+        Отсортированные номера строк каталога, которые стоит скорить
+
+        Args:
+            liked_ids: FMA id последних лайкнутых треков
+            user_genre: Любимый жанр из анкеты пользователя
+        """
+        constraints = []
+        genre = fma_genre(user_genre)
+        if genre is not None and genre in self.genre_rows:
+            constraints.append(self.genre_rows[genre])
+
+        liked_rows = self.features.rows(liked_ids)
+        if len(liked_rows):
+            for edges, lists, column in zip(self.edges, self.bucket_rows, self.columns):
+                values = np.asarray(self.features.matrix[liked_rows, column], dtype=np.float32)
+                wanted = set()
+                for bucket in np.searchsorted(edges, values, side="right").tolist():
+                    low, high = bucket - self.widen, bucket + self.widen
+                    wanted.update(range(max(0, low), min(self.n_buckets, high + 1)))
+                if len(wanted) < self.n_buckets:
+                    # Корзины не пересекаются, поэтому объединение - просто склейка
+                    rows = [lists[bucket] for bucket in wanted] + [self.unknown_rows]
+                    constraints.append(np.sort(np.concatenate(rows)))
+
+        result = None
+        for rows in sorted(constraints, key=len):
+            narrowed = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(narrowed) >= self.min_candidates:
+                result = narrowed
+        return result
+
+    def record(self, candidate_rows: Sequence[np.ndarray | None], filter_ms: float, search_ms: float) -> None:
+        """Учитывает, сколько треков реально проскорено и сколько заняли стадии"""
+        with self._lock:
+            logged = self.requests // self.LOG_EVERY
+            for rows in candidate_rows:
+                self.requests += 1
+                self.narrowed += rows is not None
+                self.scored += self.catalog_size if rows is None else len(rows)
+            self.filter_ms += filter_ms
+            self.search_ms += search_ms
+            if self.requests // self.LOG_EVERY != logged:
+                logger.info(f"Candidate filter: {self.stats()}")
+
+    def stats(self) -> Dict[str, float]:
+        requests = max(self.requests, 1)
+        return {
+            "requests": self.requests,
+            "narrowed": self.narrowed,
+            "scored_share": round(self.scored / (requests * max(self.catalog_size, 1)), 4),
+            "avg_scored": round(self.scored / requests),
+            "filter_ms": round(self.filter_ms / requests, 3),
+            "search_ms": round(self.search_ms / requests, 3),
+        }
@@ -0,0 +1,159 @@
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import torch
+
+
+class EmbeddingSearch:
+    """
+    Поиск ближайших треков по косинусной схожести.
+
+    Матрица эмбеддингов нормализуется один раз при построении, поэтому
+    скоринг всего каталога - это одно умножение матрицы на вектор.
+    Уже нормированную матрицу (normalized=True) индекс не копирует, так что
+    отображенный в память файл остается общим для всех процессов.
+    """
+
+    EPS = 1e-8
+
+    def __init__(self, ids: np.ndarray, matrix: torch.Tensor, normalized: bool = False):
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(
+                f"ids and matrix size mismatch: {len(ids)} != {matrix.shape[0]}"
+            )
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        if normalized:
+            self.matrix = matrix
+        else:
+            matrix = matrix.float()
+            norms = matrix.norm(dim=1, keepdim=True).clamp_min(self.EPS)
+            self.matrix = (matrix / norms).contiguous()
+        # Строки ищутся бинарным поиском по отсортированным id: словарь
+        # на миллион треков занимал бы в каждом процессе ~100 МБ
+        self._order = np.argsort(self.ids, kind="stable")
+        self._sorted_ids = self.ids[self._order]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def exact(self) -> bool:
+        """Поиск просматривает весь каталог: короткая выдача значит, что треки кончились"""
+        return True
+
+    def rows(self, track_ids: Iterable[int]) -> List[int]:
+        """Номера строк матрицы для известных track_id (неизвестные пропускаются)"""
+        track_ids = np.fromiter((tid for tid in track_ids if tid is not None), dtype=np.int64)
+        if len(track_ids) == 0 or len(self.ids) == 0:
+            return []
+        positions = np.minimum(np.searchsorted(self._sorted_ids, track_ids), len(self.ids) - 1)
+        found = self._sorted_ids[positions] == track_ids
+        return self._order[positions[found]].tolist()
+
+    def scores(self, query_emb: torch.Tensor) -> torch.Tensor:
+        """Косинусная схожесть запроса (D,) или пачки запросов (B, D) со всеми треками каталога"""
+        query = query_emb.float()
+        query = query / query.norm(dim=-1, keepdim=True).clamp_min(self.EPS)
+        return query @ self.matrix.T
+
+    def top_k(
+        self,
+        query_emb: torch.Tensor,
+        k: int = 1,
+        exclude_ids: Iterable[int] | None = None,
+        exclude_mask: torch.Tensor | None = None,
+    ) -> List[int]:
+        """
+        Возвращает до k ближайших track_id по убыванию схожести
+
+        Args:
+            query_emb: Вектор запроса
+            k: Сколько треков вернуть
+            exclude_ids: track_id, которые нельзя рекомендовать
+            exclude_mask: Готовая маска исключений по строкам каталога
+        """
+        return self.top_k_batch(
+            query_emb.unsqueeze(0), k, [exclude_ids], exclude_mask
+        )[0]
+
+    def top_k_batch(
+        self,
+        query_embs: torch.Tensor,
+        k: int = 1,
+        exclude_ids: Sequence[Iterable[int] | None] | None = None,
+        exclude_mask: torch.Tensor | None = None,
+    ) -> List[List[int]]:
+        """
+        top_k для пачки запросов (B, D) одним умножением матриц
+
+        Args:
+            query_embs: Векторы запросов
+            k: Сколько треков вернуть на каждый запрос
+            exclude_ids: Для каждого запроса - track_id, которые нельзя рекомендовать
+            exclude_mask: Маска исключений (N,) для всех запросов или (B, N) для каждого
+        """
+        scores = self.scores(query_embs)
+        for i, ids in enumerate(exclude_ids or []):
+            rows = self.rows(ids or [])
+            if rows:
+                scores[i, rows] = -float("inf")
+        if exclude_mask is not None:
+            scores = scores.masked_fill(exclude_mask, -float("inf"))
+
+        available = torch.isfinite(scores).sum(dim=1).tolist()
+        if k == 1:
+            # argmax берет первое максимальное значение - как и перебор в цикле
+            best_rows = torch.argmax(scores, dim=1).tolist()
+            return [
+                [int(self.ids[row])] if count > 0 else []
+                for row, count in zip(best_rows, available)
+            ]
+
+        _, top_rows = torch.topk(scores, min(k, len(self.ids)), dim=1)
+        return [
+            [int(self.ids[row]) for row in rows[: min(k, count)]]
+            for rows, count in zip(top_rows.tolist(), available)
+        ]
+
+    def top_k_candidates(
+        self,
+        query_embs: torch.Tensor,
+        candidate_rows: Sequence[np.ndarray | None],
+        k: int = 1,
+        exclude_ids: Sequence[Iterable[int] | None] | None = None,
+    ) -> List[List[int]]:
+        """
+        top_k, где каждый запрос скорится только по своим строкам каталога
+
+        Args:
+            query_embs: Векторы запросов (B, D)
+            candidate_rows: Для каждого запроса - номера строк-кандидатов
+                или None (весь каталог)
+            k: Сколько треков вернуть на каждый запрос
+            exclude_ids: Для каждого запроса - track_id, которые нельзя рекомендовать
+        """
+        exclude_ids = list(exclude_ids or [None] * len(candidate_rows))
+        results: List[List[int] | None] = [None] * len(candidate_rows)
+
+        full = [i for i, rows in enumerate(candidate_rows) if rows is None]
+        if full:
+            found = self.top_k_batch(query_embs[full], k, [exclude_ids[i] for i in full])
+            for i, track_ids in zip(full, found):
+                results[i] = track_ids
+
+        query_embs = query_embs.float()
+        query_embs = query_embs / query_embs.norm(dim=-1, keepdim=True).clamp_min(self.EPS)
+        for i, rows in enumerate(candidate_rows):
+            if rows is None:
+                continue
+            rows = torch.from_numpy(np.asarray(rows, dtype=np.int64))
+            scores = self.matrix[rows] @ query_embs[i]
+            excluded = self.rows(exclude_ids[i] or [])
+            if excluded:
+                scores = scores.masked_fill(
+                    torch.isin(rows, torch.tensor(excluded, dtype=torch.long)), -float("inf")
+                )
+            count = min(k, int(torch.isfinite(scores).sum()))
+            top = torch.topk(scores, count).indices if count > 0 else rows[:0]
+            results[i] = [int(self.ids[row]) for row in rows[top].tolist()]
+        return results
@@ -0,0 +1,31 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import current_session
+
+
+class Repository:
+    """
+    Базовый репозиторий.
+
+    Внутри unit of work (core.database.unit_of_work) сессия общая на апдейт:
+    репозиторий только делает flush, а commit и close выполняет middleware.
+    Вне его (скрипты, on_startup) каждый метод, как и раньше, сам коммитит
+    и закрывает свою сессию.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @property
+    def shared(self) -> bool:
+        return self.session is current_session()
+
+    async def _commit(self) -> None:
+        if self.shared:
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
+    async def _release(self) -> None:
+        if not self.shared:
+            await self.session.close()
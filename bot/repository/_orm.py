@@ -3,6 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 
 from sqlalchemy import (
+    ARRAY,
     BigInteger,
     DateTime,
     Enum as SAEnum,
@@ -11,6 +12,7 @@ from sqlalchemy import (
     String,
     Index,
     func,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -75,6 +77,13 @@ class InteractionORM(Base):
     __table_args__ = (
         Index("ix_interactions_user_created_at", "user_id", "created_at"),
         Index("ix_interactions_user_track_action", "user_id", "track_id", "action"),
+        Index(
+            "ix_interactions_user_likes",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_where=text("action = 'like'"),
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -102,3 +111,38 @@ class InteractionORM(Base):
     # relations
     user: Mapped["UserORM"] = relationship(back_populates="interactions")
     track: Mapped["TrackORM"] = relationship(back_populates="interactions")
+
+
+class RecommendationORM(Base):
+    """Заранее посчитанный top-K для пользователя (одна строка на пользователя)"""
+
+    __tablename__ = "user_recommendations"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    track_paths: Mapped[list[str]] = mapped_column(ARRAY(String(1024)), nullable=False)
+    context: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False)
+    model_version: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+
+class CatalogVersionORM(Base):
+    """Версия каталога треков (одна строка, увеличивается триггером на tracks)"""
+
+    __tablename__ = "catalog_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import AsyncIterator, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from domain.entity.recommendation import Recommendation
+from domain.entity.user import InteractionAction
+from repository._base import Repository
+from repository._orm import InteractionORM, RecommendationORM, TrackORM, UserORM
+
+
+class RecommendationRepository(Repository):
+    async def get(self, user_id: int) -> Recommendation | None:
+        """Заранее посчитанный top-K пользователя"""
+        try:
+            result = await self.session.execute(
+                select(RecommendationORM).where(RecommendationORM.user_id == user_id)
+            )
+            recommendation_orm = result.scalar_one_or_none()
+            if recommendation_orm is None:
+                return None
+            return Recommendation(
+                user_id=recommendation_orm.user_id,
+                track_paths=list(recommendation_orm.track_paths),
+                context=tuple(recommendation_orm.context),
+                model_version=recommendation_orm.model_version,
+                created_at=recommendation_orm.created_at,
+            )
+        finally:
+            await self._release()
+
+    async def save_many(self, recommendations: List[Recommendation]) -> None:
+        """Записывает top-K пачки пользователей одним INSERT ... ON CONFLICT"""
+        if not recommendations:
+            return
+        try:
+            statement = insert(RecommendationORM).values(
+                [
+                    {
+                        "user_id": recommendation.user_id,
+                        "track_paths": recommendation.track_paths,
+                        "context": list(recommendation.context),
+                        "model_version": recommendation.model_version,
+                        "created_at": recommendation.created_at,
+                    }
+                    for recommendation in recommendations
+                ]
+            )
+            await self.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[RecommendationORM.user_id],
+                    set_={
+                        "track_paths": statement.excluded.track_paths,
+                        "context": statement.excluded.context,
+                        "model_version": statement.excluded.model_version,
+                        "created_at": statement.excluded.created_at,
+                    },
+                )
+            )
+            await self._commit()
+        finally:
+            await self._release()
+
+    async def stream_interactions(
+        self, active_since: datetime | None = None, batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[int, str, int, str, InteractionAction]]:
+        """
+        Все взаимодействия (активных) пользователей через серверный курсор,
+        по пользователям и в порядке времени
+
+        Args:
+            active_since: Только пользователи, у которых есть взаимодействия после этой даты
+            batch_size: Сколько строк забирать из курсора за раз
+
+        Yields:
+            (user_id, любимый жанр, track_id, путь к треку, действие)
+        """
+        query = (
+            select(
+                InteractionORM.user_id,
+                UserORM.favorite_music_genre,
+                TrackORM.id,
+                TrackORM.local_path,
+                InteractionORM.action,
+            )
+            .join(UserORM, UserORM.id == InteractionORM.user_id)
+            .join(TrackORM, TrackORM.id == InteractionORM.track_id)
+            .order_by(InteractionORM.user_id, InteractionORM.created_at, InteractionORM.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if active_since is not None:
+            query = query.where(
+                InteractionORM.user_id.in_(
+                    select(InteractionORM.user_id)
+                    .where(InteractionORM.created_at >= active_since)
+                    .distinct()
+                )
+            )
+        try:
+            result = await self.session.stream(query)
+            async for row in result:
+                yield tuple(row)
+        finally:
+            await self._release()
@@ -1,16 +1,32 @@
-from typing import List
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import TYPE_CHECKING, List
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from domain.entity.track import Track
-from repository._orm import TrackORM
+from repository._base import Repository
+from repository._orm import CatalogVersionORM, TrackORM
+
+if TYPE_CHECKING:
+    from repository.track_catalog import TrackCatalog
+
+
+class TrackRepository(Repository):
+    """
+    Треки каталога. Если передан загруженный TrackCatalog, чтение идет
+    из снимка в памяти, без обращения к БД
+    """
 
+    def __init__(self, session: AsyncSession, catalog: "TrackCatalog | None" = None):
+        super().__init__(session)
+        self.catalog = catalog
 
-class TrackRepository:
-    def __init__(self, session: AsyncSession):
-        self.session = session
+    @property
+    def _snapshot(self) -> "TrackCatalog | None":
+        return self.catalog if self.catalog is not None and self.catalog.loaded else None
 
     async def get_track_by_id(self, track_id: int) -> Track | None:
+        if self._snapshot is not None:
+            return self._snapshot.get(track_id)
         try:
             result = await self.session.execute(select(TrackORM).where(TrackORM.id == track_id))
             track_orm = result.scalar_one_or_none()
@@ -25,9 +41,12 @@ class TrackRepository:
                 local_path=track_orm.local_path,
             )
         finally:
-            await self.session.close()
+            await self._release()
 
     async def get_all_tracks(self) -> List[Track]:
+        """Все треки (из снимка - общий список, изменять его нельзя)"""
+        if self._snapshot is not None:
+            return self._snapshot.tracks
         try:
             result = await self.session.execute(select(TrackORM))
             return [
@@ -42,9 +61,11 @@ class TrackRepository:
                 for track in result.scalars().all()
             ]
         finally:
-            await self.session.close()
+            await self._release()
 
     async def get_track_by_path(self, path: str) -> Track | None:
+        if self._snapshot is not None:
+            return self._snapshot.get_by_path(path)
         try:
             result = await self.session.execute(select(TrackORM).where(TrackORM.local_path == path))
             track_orm = result.scalar_one_or_none()
@@ -59,4 +80,14 @@ class TrackRepository:
                 local_path=track_orm.local_path,
             )
         finally:
-            await self.session.close()
\ No newline at end of file
+            await self._release()
+
+    async def get_catalog_version(self) -> int:
+        """Версия каталога из catalog_version"""
+        try:
+            result = await self.session.execute(
+                select(CatalogVersionORM.version).where(CatalogVersionORM.id == 1)
+            )
+            return result.scalar_one_or_none() or 0
+        finally:
+            await self._release()
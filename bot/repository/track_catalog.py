@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from domain.entity.track import Track
+from repository.track import TrackRepository
+
+
+class TrackCatalog:
+    """
+    Снимок таблицы tracks в памяти процесса, индексированный по id и пути.
+
+    Каталог меняется только скриптом populate_tracks.py, поэтому снимок
+    загружается один раз и перечитывается целиком, только когда меняется
+    версия в catalog_version (ее увеличивает триггер на tracks). Об изменении
+    сообщает NOTIFY catalog_changed; если LISTEN недоступен или соединение
+    потеряно, версия все равно проверяется раз в poll_interval секунд.
+    """
+
+    CHANNEL = "catalog_changed"
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        engine: AsyncEngine,
+        poll_interval: float = 60,
+        debounce: float = 1,
+    ):
+        self.session_factory = session_factory
+        self.engine = engine
+        self.poll_interval = poll_interval
+        # Пачки вставок populate_tracks.py идут подряд - перечитываем после паузы
+        self.debounce = debounce
+        self.version: int | None = None
+        self.tracks: List[Track] = []
+        self._by_id: Dict[int, Track] = {}
+        self._by_path: Dict[str, Track] = {}
+        self._changed = asyncio.Event()
+        self._watcher: asyncio.Task | None = None
+        self._listen_connection: AsyncConnection | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def get(self, track_id: int) -> Track | None:
+        return self._by_id.get(track_id)
+
+    def get_by_path(self, path: str) -> Track | None:
+        return self._by_path.get(path)
+
+    def start(self) -> None:
+        """
+        Запускает в фоне загрузку снимка и отслеживание изменений, чтобы бот
+        начинал принимать апдейты, не дожидаясь чтения всей таблицы
+        """
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _load(self) -> None:
+        started = time.perf_counter()
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Пока снимка нет, TrackRepository читает из БД; загрузку повторит опрос версии
+            logger.exception(f"Track catalog failed to load: {e}")
+            return
+        logger.info(f"Track catalog loaded in {time.perf_counter() - started:.1f}s")
+
+    async def refresh(self) -> bool:
+        """
+        Перечитывает каталог, если версия в БД отличается от загруженной
+
+        Returns:
+            True, если снимок был заменен
+        """
+        # Версия читается до треков: если каталог поменяется между запросами,
+        # снимок окажется новее версии и просто перечитается еще раз
+        repository = TrackRepository(self.session_factory())
+        version = await repository.get_catalog_version()
+        if self.loaded and version == self.version:
+            return False
+        tracks = await TrackRepository(self.session_factory()).get_all_tracks()
+
+        # Ссылки подменяются целиком: читатели видят либо старый, либо новый снимок
+        self._by_id = {track.id: track for track in tracks}
+        self._by_path = {track.local_path: track for track in tracks}
+        self.tracks = tracks
+        logger.info(f"Track catalog {self.version} -> {version}: {len(tracks)} tracks")
+        self.version = version
+        return True
+
+    async def _watch(self) -> None:
+        await self._load()
+        await self._listen()
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.poll_interval)
+                await asyncio.sleep(self.debounce)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Track catalog refresh failed, keeping {self.version}: {e}")
+
+    async def _listen(self) -> None:
+        """LISTEN на канал изменений каталога; без него остается только опрос"""
+        try:
+            self._listen_connection = await self.engine.connect()
+            raw = await self._listen_connection.get_raw_connection()
+            await raw.driver_connection.add_listener(self.CHANNEL, self._on_notify)
+        except Exception as e:
+            logger.warning(
+                f"Track catalog LISTEN unavailable, polling every {self.poll_interval}s: {e}"
+            )
+            await self._close_listener()
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        self._changed.set()
+
+    async def _close_listener(self) -> None:
+        if self._listen_connection is not None:
+            connection, self._listen_connection = self._listen_connection, None
+            try:
+                await connection.close()
+            except Exception as e:
+                logger.warning(f"Track catalog listener close failed: {e}")
+
+    async def shutdown(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        await self._close_listener()
@@ -1,16 +1,40 @@
-from typing import List
+from typing import Any, List, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import Select, func, insert, literal, select, true, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from domain.entity.user import User, InteractionAction
+from domain.entity.user import User, InteractionAction, InteractionResult
 from domain.entity.track import Track
+from repository._base import Repository
 from repository._orm import UserORM, TrackORM, InteractionORM
+from repository.user_cache import UserCache
 
+# 'like' подставляется в текст запроса, а не параметром: иначе в обобщенном
+# плане подготовленного запроса планировщик не применит частичный индекс
+_LIKE = literal(
+    InteractionAction.like, InteractionORM.__table__.c.action.type, literal_execute=True
+)
 
-class UserRepository:
-    def __init__(self, session: AsyncSession):
-        self.session = session
+
+def _recent_likes(user_id: Any, n: int) -> Select:
+    """
+    Последние n лайков пользователя (track_id, created_at, id), новые первыми.
+    Читается по частичному индексу ix_interactions_user_likes, поэтому
+    стоимость не зависит от длины истории
+    """
+    return (
+        select(InteractionORM.track_id, InteractionORM.created_at, InteractionORM.id)
+        .where(InteractionORM.user_id == user_id, InteractionORM.action == _LIKE)
+        .order_by(InteractionORM.created_at.desc(), InteractionORM.id.desc())
+        .limit(n)
+    )
+
+
+class UserRepository(Repository):
+    def __init__(self, session: AsyncSession, user_cache: UserCache | None = None):
+        super().__init__(session)
+        self.user_cache = user_cache
 
     async def create(self, user: User):
         """Создать пользователя"""
@@ -22,7 +46,9 @@ class UserRepository:
                 favorite_music_genre=user.favorite_music_genre,
             )
             self.session.add(user_orm)
-            await self.session.commit()
+            await self._commit()
+            if self.user_cache is not None:
+                self.user_cache.invalidate(user.telegram_id)
             await self.session.refresh(user_orm)
             return User(
                 telegram_id=user_orm.telegram_id,
@@ -31,9 +57,13 @@ class UserRepository:
                 favorite_music_genre=user_orm.favorite_music_genre,
             )
         finally:
-            await self.session.close()
+            await self._release()
 
     async def get_by_telegram_id(self, telegram_id: int) -> User | None:
+        if self.user_cache is not None:
+            cached = self.user_cache.get(telegram_id)
+            if cached is not None:
+                return cached
         try:
             result = await self.session.execute(
                 select(UserORM).where(UserORM.telegram_id == telegram_id)
@@ -41,25 +71,32 @@ class UserRepository:
             user_orm = result.scalar_one_or_none()
             if user_orm is None:
                 return None
-            return User(
+            user = User(
                 id=user_orm.id,
                 telegram_id=user_orm.telegram_id,
                 gender=user_orm.gender,
                 age=user_orm.age,
                 favorite_music_genre=user_orm.favorite_music_genre,
             )
+            if self.user_cache is not None:
+                self.user_cache.put(user)
+            return user
         finally:
-            await self.session.close()
+            await self._release()
 
     async def get_user_id_by_telegram_id(self, telegram_id: int) -> int | None:
         """Получить ID пользователя по Telegram ID"""
+        if self.user_cache is not None:
+            cached = self.user_cache.get(telegram_id)
+            if cached is not None:
+                return cached.id
         try:
             result = await self.session.execute(
                 select(UserORM.id).where(UserORM.telegram_id == telegram_id)
             )
             return result.scalar_one_or_none()
         finally:
-            await self.session.close()
+            await self._release()
 
     async def get_telegram_id_by_user_id(self, user_id: int) -> int | None:
         """Получить Telegram ID пользователя по ID"""
@@ -69,7 +106,7 @@ class UserRepository:
             )
             return result.scalar_one_or_none()
         finally:
-            await self.session.close()
+            await self._release()
 
     async def get_user_tracks(self, user_id: int) -> List[Track]:
         """Получить все треки, с которыми взаимодействовал пользователь"""
@@ -93,7 +130,7 @@ class UserRepository:
                 for track in track_orms
             ]
         finally:
-            await self.session.close()
+            await self._release()
 
     async def get_liked_tracks(self, user_id: int) -> List[Track]:
         """Получить все треки, которые пользователь лайкнул"""
@@ -120,7 +157,31 @@ class UserRepository:
                 for track in track_orms
             ]
         finally:
-            await self.session.close()
+            await self._release()
+
+    async def get_recent_liked_tracks(self, user_id: int, n: int = 3) -> List[Track]:
+        """Последние n лайкнутых треков, новые первыми; история целиком не читается"""
+        likes = _recent_likes(user_id, n).subquery("likes")
+        try:
+            result = await self.session.execute(
+                select(TrackORM)
+                .join(likes, likes.c.track_id == TrackORM.id)
+                .order_by(likes.c.created_at.desc(), likes.c.id.desc())
+            )
+            track_orms = result.scalars().all()
+            return [
+                Track(
+                    id=track.id,
+                    title=track.title,
+                    artist=track.artist,
+                    duration=track.duration_ms or 0,
+                    album=track.album or "",
+                    local_path=track.local_path,
+                )
+                for track in track_orms
+            ]
+        finally:
+            await self._release()
 
     async def get_disliked_tracks(self, user_id: int) -> List[Track]:
         """Получить все треки, которые пользователь дизлайкнул"""
@@ -147,7 +208,27 @@ class UserRepository:
                 for track in track_orms
             ]
         finally:
-            await self.session.close()
+            await self._release()
+
+    async def get_interaction_counts(self) -> List[Tuple[str, str, InteractionAction, int]]:
+        """Число взаимодействий по (любимый жанр пользователя, путь к треку, действие)"""
+        try:
+            result = await self.session.execute(
+                select(
+                    UserORM.favorite_music_genre,
+                    TrackORM.local_path,
+                    InteractionORM.action,
+                    func.count(),
+                )
+                .join(InteractionORM, InteractionORM.user_id == UserORM.id)
+                .join(TrackORM, TrackORM.id == InteractionORM.track_id)
+                .group_by(
+                    UserORM.favorite_music_genre, TrackORM.local_path, InteractionORM.action
+                )
+            )
+            return [tuple(row) for row in result.all()]
+        finally:
+            await self._release()
 
     async def create_interaction(self, user_id: int, track_id: int, action: InteractionAction) -> None:
         try:
@@ -157,6 +238,96 @@ class UserRepository:
                 action=action,
             )
             self.session.add(interaction_orm)
-            await self.session.commit()
+            await self._commit()
+        finally:
+            await self._release()
+
+    async def create_interaction_returning_likes(
+        self, telegram_id: int, track_id: int, action: InteractionAction, n: int = 3
+    ) -> InteractionResult | None:
+        """
+        Записывает взаимодействие и возвращает последние n лайков пользователя
+        за один запрос: пользователь ищется по telegram_id в подзапросе,
+        вставка - data-modifying CTE
+
+        Returns:
+            None, если пользователя с таким telegram_id нет
+        """
+        target_user = (
+            select(UserORM.id, UserORM.favorite_music_genre)
+            .where(UserORM.telegram_id == telegram_id)
+            .cte("target_user")
+        )
+        inserted = (
+            insert(InteractionORM)
+            .from_select(
+                ["user_id", "track_id", "action"],
+                select(
+                    target_user.c.id,
+                    literal(track_id),
+                    literal(action, InteractionORM.__table__.c.action.type),
+                ),
+            )
+            .returning(
+                InteractionORM.id,
+                InteractionORM.user_id,
+                InteractionORM.track_id,
+                InteractionORM.action,
+                InteractionORM.created_at,
+            )
+            .cte("inserted")
+        )
+        # Запрос видит таблицу до вставки, поэтому новый лайк добавляется к прошлым отдельно
+        previous = _recent_likes(select(target_user.c.id).scalar_subquery(), n).subquery(
+            "previous"
+        )
+        likes = union_all(
+            select(inserted.c.track_id, inserted.c.created_at, inserted.c.id).where(
+                inserted.c.action == InteractionAction.like
+            ),
+            select(previous.c.track_id, previous.c.created_at, previous.c.id),
+        ).subquery("likes")
+        current_track = aliased(TrackORM)
+        liked_track = aliased(TrackORM)
+
+        try:
+            result = await self.session.execute(
+                select(
+                    target_user.c.id,
+                    target_user.c.favorite_music_genre,
+                    current_track.local_path,
+                    liked_track,
+                )
+                .select_from(target_user)
+                .join(inserted, inserted.c.user_id == target_user.c.id)
+                .join(current_track, current_track.id == inserted.c.track_id)
+                # Без лайков остается одна строка с NULL вместо трека
+                .outerjoin(likes, true())
+                .outerjoin(liked_track, liked_track.id == likes.c.track_id)
+                .order_by(likes.c.created_at.desc(), likes.c.id.desc())
+                .limit(n)
+            )
+            rows = result.all()
+            await self._commit()
+            if not rows:
+                return None
+            user_id, genre, track_path, _ = rows[0]
+            return InteractionResult(
+                user_id=user_id,
+                favorite_music_genre=genre,
+                track_path=track_path,
+                recent_likes=[
+                    Track(
+                        id=track.id,
+                        title=track.title,
+                        artist=track.artist,
+                        duration=track.duration_ms or 0,
+                        album=track.album or "",
+                        local_path=track.local_path,
+                    )
+                    for *_, track in reversed(rows)
+                    if track is not None
+                ],
+            )
         finally:
-            await self.session.close()
\ No newline at end of file
+            await self._release()
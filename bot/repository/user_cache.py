@@ -0,0 +1,18 @@
+from core.ttl_cache import TTLCache
+from domain.entity.user import User
+
+
+class UserCache(TTLCache[int, User]):
+    """
+    LRU/TTL-кэш профилей пользователей по telegram_id.
+
+    Профиль почти не меняется, поэтому повторные нажатия кнопок не ходят
+    в БД. Отсутствие пользователя не кэшируется (он может как раз проходить
+    анкету), а UserRepository.create явно сбрасывает запись.
+    """
+
+    def __init__(self, capacity: int = 10000, ttl_seconds: float = 300):
+        super().__init__("User cache", capacity, ttl_seconds)
+
+    def put(self, user: User) -> User:
+        return super().put(user.telegram_id, user)
@@ -0,0 +1,184 @@
+"""
+Скрипт для офлайн-расчета top-K рекомендаций активных пользователей
+в таблицу user_recommendations
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+from loguru import logger
+
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.config import settings
+from core.database import async_session_factory, engine
+from domain.entity.recommendation import Recommendation
+from domain.entity.track import Track
+from domain.entity.user import InteractionAction
+from recsys.exclusions import ExclusionBitmaps
+from recsys.ids import extract_track_id_from_filename
+from recsys.model import RecommendationModel
+from repository.recommendation import RecommendationRepository
+
+
+class _UserHistory:
+    def __init__(self, user_id: int, genre: str | None):
+        self.user_id = user_id
+        self.genre = genre
+        self.likes: List[Track] = []
+        # FMA id всех треков пользователя - их не рекомендуем
+        self.heard: List[int | None] = []
+
+
+async def recommend_batch(
+    model: RecommendationModel,
+    exclusions: ExclusionBitmaps,
+    users: List[_UserHistory],
+    k: int,
+) -> int:
+    """Считает top-K для пачки пользователей и записывает их в БД"""
+    for user in users:
+        exclusions.load(user.user_id, user.heard)
+    created_at = datetime.now(timezone.utc)
+    # Инференс в отдельном потоке, чтобы не блокировать серверный курсор
+    results = await asyncio.to_thread(
+        model.pick_top_k_batch,
+        [user.likes for user in users],
+        k,
+        [exclusions.get(user.user_id) for user in users],
+        [user.genre for user in users],
+    )
+    recommendations = [
+        Recommendation(
+            user_id=user.user_id,
+            track_paths=paths,
+            context=tuple(track.id for track in user.likes[-3:]),
+            model_version=model.version,
+            created_at=created_at,
+        )
+        for user, paths in zip(users, results)
+        if paths
+    ]
+    await RecommendationRepository(async_session_factory()).save_many(recommendations)
+    return len(recommendations)
+
+
+async def batch_recommend(
+    model: RecommendationModel,
+    k: int,
+    batch_size: int = 64,
+    active_days: float | None = None,
+    fetch_size: int = 1000,
+):
+    """
+    Проходит по взаимодействиям пользователей серверным курсором
+    и пишет top-K пачками по batch_size пользователей
+
+    Args:
+        model: Загруженная рекомендательная модель
+        k: Сколько треков сохранять на пользователя
+        batch_size: Сколько пользователей прогонять через модель за раз
+        active_days: Только пользователи, активные за последние active_days дней
+        fetch_size: Сколько строк забирать из курсора за раз
+    """
+    exclusions = ExclusionBitmaps(max_users=batch_size)
+    exclusions.bind_catalog(model.search.ids)
+    active_since = (
+        datetime.now(timezone.utc) - timedelta(days=active_days) if active_days else None
+    )
+
+    started = time.perf_counter()
+    users_seen = 0
+    saved = 0
+    batch: List[_UserHistory] = []
+    current: _UserHistory | None = None
+
+    async def flush() -> None:
+        nonlocal saved, batch
+        # Пользователи без лайков остаются холодному старту
+        active = [user for user in batch if user.likes]
+        if active:
+            saved += await recommend_batch(model, exclusions, active, k)
+        batch = []
+        logger.info(
+            f"Пользователей: {users_seen}, сохранено top-K: {saved} "
+            f"({users_seen / (time.perf_counter() - started):.1f} пользователей/с)"
+        )
+
+    repository = RecommendationRepository(async_session_factory())
+    async for user_id, genre, track_id, path, action in repository.stream_interactions(
+        active_since, batch_size=fetch_size
+    ):
+        if current is None or current.user_id != user_id:
+            if len(batch) >= batch_size:
+                await flush()
+            current = _UserHistory(user_id, genre)
+            batch.append(current)
+            users_seen += 1
+        current.heard.append(extract_track_id_from_filename(path))
+        if action == InteractionAction.like:
+            current.likes.append(Track(track_id, "", "", 0, "", path))
+    if batch:
+        await flush()
+
+    logger.success(
+        f"Готово! top-K модели {model.version} сохранен для {saved} из {users_seen} пользователей"
+    )
+
+
+async def main():
+    """Основная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Офлайн-расчет top-K рекомендаций")
+    parser.add_argument("--k", type=int, default=settings.BATCH_RECOMMENDATIONS_K)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--active-days",
+        type=float,
+        default=None,
+        help="Только пользователи с взаимодействиями за последние N дней",
+    )
+    parser.add_argument("--fetch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+
+    model = RecommendationModel(
+        model_path=settings.MODEL_PATH,
+        embeddings_parquet=settings.EMBEDDINGS_PARQUET,
+        audio_features_parquet=settings.AUDIO_FEATURES_PARQUET,
+        embeddings_dtype=settings.EMBEDDINGS_DTYPE,
+        embeddings_mmap=settings.EMBEDDINGS_MMAP,
+        mel_store_dir=settings.MEL_STORE_DIR,
+        mel_cache_size=settings.MEL_CACHE_SIZE,
+        encoder_cache_dir=settings.ENCODER_CACHE_DIR,
+        search_kind=settings.RECSYS_SEARCH,
+        ann_n_lists=settings.ANN_N_LISTS,
+        ann_nprobe=settings.ANN_NPROBE,
+        ann_index_path=settings.ANN_INDEX_PATH,
+        inference_mode=settings.INFERENCE_MODE,
+        prefilter_enabled=settings.PREFILTER_ENABLED,
+        prefilter_features=settings.PREFILTER_FEATURES,
+        prefilter_buckets=settings.PREFILTER_BUCKETS,
+        prefilter_min_candidates=settings.PREFILTER_MIN_CANDIDATES,
+        track_genres_path=settings.TRACK_GENRES_PATH,
+    )
+    await batch_recommend(
+        model,
+        k=args.k,
+        batch_size=args.batch_size,
+        active_days=args.active_days,
+        fetch_size=args.fetch_size,
+    )
+
+    # Закрываем соединение с БД
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+"""
+Скрипт для конвертации pickle-модели в формат torch.save,
+который бот загружает через mmap
+"""
+
+from pathlib import Path
+
+import torch
+from loguru import logger
+
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from recsys.model import load_model
+
+
+def main():
+    """Основная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Конвертация модели в torch.save")
+    parser.add_argument("source", type=str, help="Путь к recommender_model.pkl")
+    parser.add_argument("target", type=str, help="Путь к итоговому .pt файлу")
+
+    args = parser.parse_args()
+
+    model = load_model(args.source)
+    torch.save(model, args.target)
+    logger.success(f"Модель сохранена в {args.target}, укажите его в MODEL_PATH")
+
+
+if __name__ == "__main__":
+    main()
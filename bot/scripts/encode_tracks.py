@@ -0,0 +1,105 @@
+"""
+Скрипт для офлайн-расчета выходов аудио-энкодера по всем трекам из data/fma_small
+"""
+
+import time
+from pathlib import Path
+
+from loguru import logger
+
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.config import settings
+from recsys.model import RecommendationModel, extract_track_id_from_filename
+from populate_tracks import find_all_mp3_files
+
+
+def encode_all_tracks(model: RecommendationModel, data_dir: Path, batch_size: int = 32):
+    """
+    Прогоняет энкодер по трекам, которых еще нет в кэше
+
+    Args:
+        model: Загруженная рекомендательная модель
+        data_dir: Путь к директории с MP3 файлами
+        batch_size: Сколько треков прогонять через энкодер за раз
+    """
+    if not model.split_encoder:
+        logger.error("Модель не поддерживает раздельный энкодер (encode/aggregate)")
+        return
+
+    tracks = []
+    for path in find_all_mp3_files(data_dir):
+        track_id = extract_track_id_from_filename(path.name)
+        if (
+            track_id is not None
+            and track_id not in model.encoder_cache
+            and track_id in model.track_embeddings_features
+        ):
+            tracks.append((track_id, str(path)))
+    logger.info(f"Энкодер: уже посчитано {len(model.encoder_cache)}, осталось {len(tracks)}")
+
+    started = time.perf_counter()
+    for i in range(0, len(tracks), batch_size):
+        batch = tracks[i : i + batch_size]
+        encoded = model.encode_tracks(batch)
+        model.encoder_cache.put_many(
+            (track_id, vector) for (track_id, _), vector in zip(batch, encoded)
+        )
+        done = i + len(batch)
+        logger.info(
+            f"Энкодер: {done}/{len(tracks)} ({done / (time.perf_counter() - started):.1f} треков/с)"
+        )
+
+    logger.success(f"Готово! Всего в кэше энкодера: {len(model.encoder_cache)}")
+
+
+def main():
+    """Основная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Расчет выходов аудио-энкодера")
+    parser.add_argument(
+        "--data-dir", type=str, default=None, help="Путь к директории с MP3 файлами"
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+
+    args = parser.parse_args()
+
+    if args.data_dir:
+        data_dir = Path(args.data_dir)
+    else:
+        data_dir = Path(__file__).parent.parent.parent / "data" / "fma_small"
+
+    if not data_dir.exists():
+        logger.error(f"Директория {data_dir} не найдена!")
+        return
+
+    model = RecommendationModel(
+        model_path=settings.MODEL_PATH,
+        embeddings_parquet=settings.EMBEDDINGS_PARQUET,
+        audio_features_parquet=settings.AUDIO_FEATURES_PARQUET,
+        embeddings_dtype=settings.EMBEDDINGS_DTYPE,
+        embeddings_mmap=settings.EMBEDDINGS_MMAP,
+        mel_store_dir=settings.MEL_STORE_DIR,
+        mel_cache_size=settings.MEL_CACHE_SIZE,
+        encoder_cache_dir=settings.ENCODER_CACHE_DIR,
+        search_kind=settings.RECSYS_SEARCH,
+        ann_n_lists=settings.ANN_N_LISTS,
+        ann_nprobe=settings.ANN_NPROBE,
+        ann_index_path=settings.ANN_INDEX_PATH,
+        # Кэш энкодера версионируется по режиму инференса: с другим режимом
+        # скрипт заполнил бы каталог, который бот не читает
+        inference_mode=settings.INFERENCE_MODE,
+        prefilter_enabled=settings.PREFILTER_ENABLED,
+        prefilter_features=settings.PREFILTER_FEATURES,
+        prefilter_buckets=settings.PREFILTER_BUCKETS,
+        prefilter_min_candidates=settings.PREFILTER_MIN_CANDIDATES,
+        track_genres_path=settings.TRACK_GENRES_PATH,
+    )
+    encode_all_tracks(model, data_dir, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
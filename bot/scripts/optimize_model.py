@@ -0,0 +1,138 @@
+"""
+Скрипт для сборки оптимизированной модели (TorchScript / int8) и проверки
+ее расхождения с исходной fp32-моделью
+"""
+
+import random
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from loguru import logger
+
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.config import settings
+from recsys.embedding_table import EmbeddingTable
+from recsys.mel_cache import MelStore
+from recsys.model import load_model
+from recsys.optimize import cosine_drift, export, optimized_model_path
+from recsys.search import EmbeddingSearch
+
+
+def sample_inputs(
+    mel_store: MelStore, features: EmbeddingTable, n_samples: int, seq_len: int = 3
+) -> list[tuple[torch.Tensor, torch.Tensor]]:
+    """
+    Случайные последовательности треков, для которых есть и спектрограмма,
+    и аудио-признаки
+
+    Args:
+        mel_store: Хранилище спектрограмм (scripts/populate_tracks.py --precompute-mels)
+        features: Таблица аудио-признаков
+        n_samples: Сколько последовательностей собрать
+        seq_len: Длина последовательности
+    """
+    track_ids = [track_id for track_id in mel_store.ids() if track_id in features]
+    if len(track_ids) < seq_len:
+        raise RuntimeError("В хранилище спектрограмм недостаточно треков")
+
+    rng = random.Random(0)
+    samples = []
+    for _ in range(n_samples):
+        tracks = rng.sample(track_ids, seq_len)
+        mel = np.stack([np.asarray(mel_store.get(track_id), dtype=np.float32) for track_id in tracks])
+        meta = np.stack([np.asarray(features[track_id], dtype=np.float32) for track_id in tracks])
+        samples.append((torch.from_numpy(mel).unsqueeze(1), torch.from_numpy(meta)))
+    return samples
+
+
+def run(model, samples) -> tuple[torch.Tensor, list[float]]:
+    """Эмбеддинги запросов и время каждого прохода в мс"""
+    outputs, timings = [], []
+    with torch.no_grad():
+        for mel, meta in samples:
+            started = time.perf_counter()
+            outputs.append(model(mel, meta)[-1])
+            timings.append((time.perf_counter() - started) * 1000)
+    return torch.stack(outputs), timings
+
+
+def check_parity(reference, optimized, samples, search: EmbeddingSearch) -> dict:
+    """Сравнивает оптимизированную модель с исходной на одних и тех же входах"""
+    # Прогрев: первые проходы TorchScript включают оптимизацию графа
+    run(reference, samples[:2])
+    run(optimized, samples[:2])
+
+    ref_embs, ref_ms = run(reference, samples)
+    opt_embs, opt_ms = run(optimized, samples)
+
+    drift = cosine_drift(ref_embs, opt_embs)
+    ref_top1 = search.top_k_batch(ref_embs, k=1)
+    opt_top1 = search.top_k_batch(opt_embs, k=1)
+    agreement = sum(a == b for a, b in zip(ref_top1, opt_top1)) / len(samples)
+
+    return {
+        "cosine_drift_mean": float(drift.mean()),
+        "cosine_drift_max": float(drift.max()),
+        "top1_agreement": agreement,
+        "fp32_ms_p50": statistics.median(ref_ms),
+        "optimized_ms_p50": statistics.median(opt_ms),
+        "speedup": statistics.median(ref_ms) / statistics.median(opt_ms),
+    }
+
+
+def main():
+    """Основная функция"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сборка оптимизированной модели")
+    parser.add_argument("--mode", choices=["torchscript", "int8"], default="int8")
+    parser.add_argument("--samples", type=int, default=64, help="Размер выборки для проверки")
+    parser.add_argument("--threads", type=int, default=1, help="Потоки torch при замерах")
+    parser.add_argument(
+        "--max-drift",
+        type=float,
+        default=0.01,
+        help="Максимальный косинусный дрейф, при котором модель можно включать",
+    )
+
+    args = parser.parse_args()
+    torch.set_num_threads(args.threads)
+
+    model = load_model(settings.MODEL_PATH).eval()
+    features = EmbeddingTable.load(settings.AUDIO_FEATURES_PARQUET, dtype=np.float32)
+    embeddings = EmbeddingTable.load(settings.EMBEDDINGS_PARQUET, dtype=np.float32)
+    samples = sample_inputs(MelStore(settings.MEL_STORE_DIR), features, args.samples)
+
+    logger.info(f"Экспорт модели в режиме {args.mode}...")
+    optimized = export(model, samples[0], args.mode)
+    target = optimized_model_path(settings.MODEL_PATH, args.mode)
+    torch.jit.save(optimized, str(target))
+    logger.info(f"Модель сохранена в {target}")
+
+    search = EmbeddingSearch(embeddings.ids, torch.from_numpy(np.asarray(embeddings.matrix)))
+    report = check_parity(model, torch.jit.load(str(target)), samples, search)
+    logger.info(
+        f"Косинусный дрейф: среднее {report['cosine_drift_mean']:.2e}, "
+        f"максимум {report['cosine_drift_max']:.2e}"
+    )
+    logger.info(f"Совпадение top-1: {report['top1_agreement']:.1%}")
+    if report["cosine_drift_max"] > args.max_drift:
+        logger.error(
+            f"Дрейф {report['cosine_drift_max']:.2e} больше --max-drift {args.max_drift:.2e}, "
+            f"режим {args.mode} включать нельзя"
+        )
+        sys.exit(1)
+    logger.success(
+        f"fp32 {report['fp32_ms_p50']:.1f} мс -> {args.mode} {report['optimized_ms_p50']:.1f} мс "
+        f"(ускорение x{report['speedup']:.2f}), включите INFERENCE_MODE={args.mode}"
+    )
+
+
+if __name__ == "__main__":
+    main()
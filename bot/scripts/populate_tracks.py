@@ -4,9 +4,12 @@
 
 import asyncio
 import os
+import time
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
+import numpy as np
 from loguru import logger
 from mutagen.mp3 import MP3
 from sqlalchemy import select
@@ -15,8 +18,21 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from core.config import settings
 from core.database import async_session_factory, engine
 from repository._orm import TrackORM
+from recsys.ids import extract_track_id_from_filename
+from recsys.mel_cache import MelStore
+
+# torch и librosa (recsys.frontend) нужны только для --precompute-mels,
+# заполнение таблицы tracks обходится без них
+if TYPE_CHECKING:
+    from recsys.frontend import MelFrontend
+
+MEL_TARGET_LEN = 1300
+
+# Фронтенд создается один раз в каждом процессе пула
+_frontend: "MelFrontend | None" = None
 
 
 def get_mp3_metadata(file_path: Path) -> Optional[dict]:
@@ -175,6 +191,93 @@ async def populate_tracks_table(
         logger.info(f"Всего записей в таблице tracks: {total_tracks}")
 
 
+def compute_mel(file_path: Path) -> tuple[int, Optional[np.ndarray]]:
+    """
+    Считает спектрограмму так же, как RecommendationModel при промахе кэша
+
+    Args:
+        file_path: Путь к MP3 файлу
+
+    Returns:
+        Пара (track_id, спектрограмма) или (track_id, None) при ошибке
+    """
+    global _frontend
+    if _frontend is None:
+        import torch
+
+        from recsys.frontend import MelFrontend
+
+        # Параллелизм дает пул процессов, потоки torch только мешали бы
+        torch.set_num_threads(1)
+        _frontend = MelFrontend(target_len=MEL_TARGET_LEN)
+
+    track_id = extract_track_id_from_filename(str(file_path))
+    try:
+        mel = _frontend.load([str(file_path)])[0]
+        # Хранилище все равно float16 - вдвое меньше данных между процессами
+        return track_id, mel.astype(MelStore.DTYPE)
+    except Exception as e:
+        logger.error(f"Ошибка при расчете спектрограммы {file_path}: {e}")
+        return track_id, None
+
+
+def precompute_mels(
+    data_dir: Path, store_dir: Path, workers: int, batch_size: int = 100
+):
+    """
+    Заранее считает мел-спектрограммы всех треков и пишет их в MelStore.
+    Уже посчитанные треки пропускаются, поэтому после падения
+    скрипт можно просто перезапустить.
+
+    Args:
+        data_dir: Путь к директории с MP3 файлами
+        store_dir: Путь к хранилищу спектрограмм
+        workers: Количество процессов
+        batch_size: Как часто сбрасывать результаты на диск
+    """
+    store = MelStore(store_dir, target_len=MEL_TARGET_LEN)
+
+    mp3_files = []
+    for path in find_all_mp3_files(data_dir):
+        track_id = extract_track_id_from_filename(path.name)
+        if track_id is not None and track_id not in store:
+            mp3_files.append(path)
+    logger.info(
+        f"Спектрограммы: уже посчитано {len(store)}, осталось {len(mp3_files)}"
+    )
+    if not mp3_files:
+        return
+
+    pending = []
+    done = 0
+    error_count = 0
+    started = time.perf_counter()
+
+    with Pool(processes=workers) as pool:
+        for track_id, mel in pool.imap_unordered(compute_mel, mp3_files, chunksize=4):
+            done += 1
+            if mel is None:
+                error_count += 1
+            else:
+                pending.append((track_id, mel))
+
+            if len(pending) >= batch_size or done == len(mp3_files):
+                store.put_many(pending)
+                pending = []
+                elapsed = time.perf_counter() - started
+                rate = done / elapsed
+                logger.info(
+                    f"Спектрограммы: {done}/{len(mp3_files)} "
+                    f"({rate:.1f} файлов/с, {rate / workers:.2f} файлов/с на ядро, ошибок: {error_count})"
+                )
+
+    elapsed = time.perf_counter() - started
+    logger.success(
+        f"Спектрограммы готовы за {elapsed:.0f} с: "
+        f"{done / elapsed / workers:.2f} файлов/с на ядро, всего в хранилище {len(store)}"
+    )
+
+
 async def main():
     """Основная функция"""
     import argparse
@@ -190,6 +293,23 @@ async def main():
     parser.add_argument(
         "--data-dir", type=str, default=None, help="Путь к директории с MP3 файлами"
     )
+    parser.add_argument(
+        "--precompute-mels",
+        action="store_true",
+        help="Дополнительно посчитать мел-спектрограммы всех треков",
+    )
+    parser.add_argument(
+        "--mel-store-dir",
+        type=str,
+        default=settings.MEL_STORE_DIR,
+        help="Путь к хранилищу мел-спектрограмм",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Количество процессов для расчета спектрограмм",
+    )
 
     args = parser.parse_args()
 
@@ -207,6 +327,10 @@ async def main():
     logger.info(f"Начало заполнения таблицы tracks из {data_dir}")
     await populate_tracks_table(data_dir, skip_if_exists=args.skip_if_exists)
 
+    if args.precompute_mels:
+        logger.info(f"Расчет мел-спектрограмм в {args.mel_store_dir} ({args.workers} процессов)")
+        precompute_mels(data_dir, Path(args.mel_store_dir), workers=args.workers)
+
     # Закрываем соединение с БД
     await engine.dispose()
 
@@ -1,7 +1,10 @@
-from typing import List, Protocol
+from typing import List, Protocol, Tuple
 
+import numpy as np
+
+from domain.entity.recommendation import Recommendation
 from domain.entity.track import Track
-from domain.entity.user import User, InteractionAction
+from domain.entity.user import User, InteractionAction, InteractionResult
 
 """
 Файл в котором мы определяем контракты для работы с базой данных.
@@ -11,6 +14,8 @@ from domain.entity.user import User, InteractionAction
 
 class TrackRepositoryProtocol(Protocol):
     async def get_all_tracks(self) -> List[Track]: ...
+
+    async def get_track_by_id(self, track_id: int) -> Track | None: ...
     
     async def get_track_by_path(self, path: str) -> Track | None: ...
 
@@ -28,10 +33,32 @@ class UserRepositoryProtocol(Protocol):
 
     async def get_liked_tracks(self, user_id: int) -> List[Track]: ...
 
+    async def get_recent_liked_tracks(self, user_id: int, n: int = 3) -> List[Track]: ...
+
     async def get_disliked_tracks(self, user_id: int) -> List[Track]: ...
 
+    async def get_interaction_counts(self) -> List[Tuple[str, str, InteractionAction, int]]: ...
+
     async def create_interaction(self, user_id: int, track_id: int, action: InteractionAction) -> None: ...
 
+    async def create_interaction_returning_likes(
+        self, telegram_id: int, track_id: int, action: InteractionAction, n: int = 3
+    ) -> InteractionResult | None: ...
+
+
+class RecommendationRepositoryProtocol(Protocol):
+    async def get(self, user_id: int) -> Recommendation | None: ...
+
 
 class RecommendationModelProtocol(Protocol):
-    def pick_next(self, likes: List[Track]) -> str: ...
+    version: str | None
+
+    async def pick_next(self, likes: List[Track]) -> str: ...
+
+    async def pick_top_k(
+        self,
+        likes: List[Track],
+        k: int,
+        exclude: np.ndarray | None = None,
+        genre: str | None = None,
+    ) -> List[str]: ...
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+
+from loguru import logger
+
+from domain.entity.user import InteractionAction
+from recsys.ids import extract_track_id_from_filename
+
+# Ключ рейтинга - любимый жанр из анкеты, None - общий рейтинг
+GenreKey = str | None
+
+
+class PopularityRanking:
+    """
+    Популярные треки по жанрам пользователей и в целом - рекомендации
+    для холодного старта без инференса модели.
+
+    Счетчики обновляются на каждой записи взаимодействия, а отсортированный
+    топ size треков пересобирается не чаще раза в refresh_seconds, поэтому
+    выдача - это проход по готовому списку фиксированной длины.
+    Треки хранятся по FMA id, чтобы исключать уже прослушанные через
+    ExclusionBitmaps.
+    """
+
+    WEIGHTS = {
+        InteractionAction.like: 1.0,
+        InteractionAction.skip: -0.25,
+        InteractionAction.dislike: -1.0,
+    }
+
+    def __init__(self, size: int = 200, refresh_seconds: float = 10):
+        self.size = size
+        self.refresh_seconds = refresh_seconds
+        self.loaded = False
+        self._scores: Dict[GenreKey, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        self._paths: Dict[int, str] = {}
+        self._top: Dict[GenreKey, List[int]] = {}
+        self._built_at: Dict[GenreKey, float] = {}
+        self._dirty: Set[GenreKey] = set()
+        self._loading: asyncio.Task | None = None
+
+    def start(
+        self,
+        load_counts: Callable[[], Awaitable[Iterable[Tuple[str | None, str, InteractionAction, int]]]],
+    ) -> None:
+        """
+        Запускает начальную загрузку счетчиков в фоне, чтобы бот начинал
+        принимать апдейты, не дожидаясь агрегата по всей таблице
+
+        Args:
+            load_counts: Корутина со счетчиками для bootstrap
+        """
+        if self._loading is None:
+            self._loading = asyncio.create_task(self._load(load_counts))
+
+    async def _load(self, load_counts) -> None:
+        started = time.perf_counter()
+        try:
+            counts = await load_counts()
+        except Exception as e:
+            # Без начальных счетчиков рейтинг наполняется новыми взаимодействиями
+            logger.exception(f"Popularity ranking failed to load: {e}")
+            return
+        self.bootstrap(counts)
+        logger.info(f"Popularity ranking loaded in {time.perf_counter() - started:.1f}s")
+
+    def shutdown(self) -> None:
+        if self._loading is not None:
+            self._loading.cancel()
+
+    def bootstrap(self, counts: Iterable[Tuple[str | None, str, InteractionAction, int]]) -> None:
+        """
+        Начальные счетчики из БД
+
+        Args:
+            counts: (жанр пользователя, путь к треку, действие, число взаимодействий)
+        """
+        for genre, path, action, count in counts:
+            self.record(genre, path, action, count)
+        self.loaded = True
+        logger.info(
+            f"Popularity ranking bootstrapped: {len(self._paths)} tracks, "
+            f"{sum(key is not None for key in self._scores)} genres"
+        )
+
+    def record(
+        self, genre: str | None, path: str, action: InteractionAction, count: int = 1
+    ) -> None:
+        """Учитывает взаимодействие пользователя с любимым жанром genre"""
+        track_id = extract_track_id_from_filename(path)
+        if track_id is None:
+            return
+        self._paths[track_id] = path
+        delta = self.WEIGHTS.get(action, 0.0) * count
+        for key in {genre, None}:
+            self._scores[key][track_id] += delta
+            self._dirty.add(key)
+
+    def top(
+        self, genre: str | None, k: int, exclude: Callable[[int], bool] | None = None
+    ) -> List[str]:
+        """
+        До k популярных треков: сначала по жанру, затем из общего рейтинга
+
+        Args:
+            genre: Любимый жанр пользователя
+            k: Сколько треков вернуть
+            exclude: Проверка по FMA id, что трек уже был у пользователя
+        """
+        paths: List[str] = []
+        seen: Set[int] = set()
+        for key in (genre, None):
+            for track_id in self._ranking(key):
+                if len(paths) >= k:
+                    return paths
+                if track_id in seen or (exclude is not None and exclude(track_id)):
+                    continue
+                seen.add(track_id)
+                paths.append(self._paths[track_id])
+        return paths
+
+    def _ranking(self, key: GenreKey) -> List[int]:
+        now = time.monotonic()
+        if key in self._dirty and now - self._built_at.get(key, 0.0) >= self.refresh_seconds:
+            scores = self._scores.get(key, {})
+            self._top[key] = sorted(
+                (track_id for track_id, score in scores.items() if score > 0),
+                key=scores.__getitem__,
+                reverse=True,
+            )[: self.size]
+            self._built_at[key] = now
+            self._dirty.discard(key)
+        return self._top.get(key, [])
@@ -0,0 +1,127 @@
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, List, Set, Tuple
+
+from loguru import logger
+
+# Контекст рекомендации - id последних лайкнутых треков
+Context = Tuple[int, ...]
+
+
+@dataclass
+class _UserQueue:
+    context: Context
+    paths: Deque[str] = field(default_factory=deque)
+    served: Set[str] = field(default_factory=set)
+    refilling: bool = False
+
+
+class RecommendationQueues:
+    """
+    Очереди следующих рекомендаций по пользователям (общие для всех апдейтов).
+
+    Очередь заполняется top-K результатом одного прохода модели и годится,
+    пока не поменялся контекст (последние лайки). Когда в очереди остается
+    low_watermark треков или меньше, она дозаполняется в фоне.
+    """
+
+    def __init__(self, size: int = 5, low_watermark: int = 1, max_users: int = 10000):
+        self.size = size
+        self.low_watermark = low_watermark
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self._queues: OrderedDict[int, _UserQueue] = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def pop(self, user_id: int, context: Context) -> str | None:
+        """Следующий трек из очереди или None, если очередь пуста или устарела"""
+        queue = self._queues.get(user_id)
+        if queue is not None and queue.context != context:
+            # Новые лайки поменяли контекст - старая очередь больше не нужна
+            self.invalidate(user_id)
+            queue = None
+        if queue is None or not queue.paths:
+            self.misses += 1
+            return None
+        self._queues.move_to_end(user_id)
+        self.hits += 1
+        path = queue.paths.popleft()
+        queue.served.add(path)
+        return path
+
+    def fill(self, user_id: int, context: Context, paths: List[str], served: List[str] = ()) -> None:
+        """
+        Кладет в очередь top-K для контекста
+
+        Args:
+            user_id: ID пользователя
+            context: Контекст, для которого посчитан top-K
+            paths: top-K путей по убыванию схожести
+            served: Пути, которые уже отданы пользователю в этом контексте
+        """
+        queue = self._queues.get(user_id)
+        if queue is None or queue.context != context:
+            queue = _UserQueue(context=context)
+            self._queues[user_id] = queue
+        queue.served.update(served)
+        queue.paths = deque(path for path in paths if path not in queue.served)
+        self._queues.move_to_end(user_id)
+        while len(self._queues) > self.max_users:
+            self._queues.popitem(last=False)
+
+    def served_count(self, user_id: int, context: Context) -> int:
+        """Сколько треков уже отдано пользователю в этом контексте"""
+        queue = self._queues.get(user_id)
+        if queue is None or queue.context != context:
+            return 0
+        return len(queue.served)
+
+    def invalidate(self, user_id: int) -> None:
+        self._queues.pop(user_id, None)
+
+    def needs_refill(self, user_id: int, context: Context) -> bool:
+        queue = self._queues.get(user_id)
+        if queue is None or queue.context != context:
+            return True
+        return not queue.refilling and len(queue.paths) <= self.low_watermark
+
+    def refill_in_background(
+        self,
+        user_id: int,
+        context: Context,
+        compute: Callable[[int], Awaitable[List[str]]],
+    ) -> None:
+        """
+        Пересчитывает очередь в фоне
+
+        Args:
+            user_id: ID пользователя
+            context: Контекст, для которого считается очередь
+            compute: Корутина, возвращающая top-k путей для переданного k
+        """
+        queue = self._queues.get(user_id)
+        already_served = 0
+        if queue is not None and queue.context == context:
+            queue.refilling = True
+            already_served = len(queue.served)
+
+        async def refill() -> None:
+            try:
+                paths = await compute(already_served + self.size)
+            except Exception as e:
+                logger.warning(f"Recommendation queue refill failed for user {user_id}: {e}")
+                paths = None
+            current = self._queues.get(user_id)
+            if current is not None and current.context == context:
+                current.refilling = False
+            elif current is not None:
+                # Пока считали, контекст успел поменяться
+                return
+            if paths is not None:
+                self.fill(user_id, context, paths)
+
+        task = asyncio.create_task(refill())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -1,20 +1,47 @@
+from datetime import datetime, timezone
 from typing import List
 
+from loguru import logger
+
+from core.database import commit_unit_of_work
 from domain.entity.user import User, InteractionAction
 from domain.entity.track import Track
-from service._contract import UserRepositoryProtocol, RecommendationModelProtocol, TrackRepositoryProtocol
+from service._contract import (
+    UserRepositoryProtocol,
+    RecommendationModelProtocol,
+    TrackRepositoryProtocol,
+    RecommendationRepositoryProtocol,
+)
+from service.recommendation_queue import RecommendationQueues
+from service.popularity import PopularityRanking
+from recsys.errors import RecommenderUnavailable
+from recsys.exclusions import ExclusionBitmaps
+from recsys.ids import extract_track_id_from_filename
 
 
 class UserService:
+    # Сколько последних лайков задают контекст рекомендации (столько же берет модель)
+    RECENT_LIKES = 3
+
     def __init__(
         self, 
         model: RecommendationModelProtocol,
         user_repository: UserRepositoryProtocol,
         track_repository: TrackRepositoryProtocol,
+        recommendation_queues: RecommendationQueues,
+        exclusions: ExclusionBitmaps,
+        popularity: PopularityRanking,
+        recommendation_repository: RecommendationRepositoryProtocol | None = None,
+        batch_max_age: float = 86400,
     ):
         self.model = model
         self.user_repository = user_repository
         self.track_repository = track_repository
+        self.recommendation_queues = recommendation_queues
+        self.exclusions = exclusions
+        self.popularity = popularity
+        self.recommendation_repository = recommendation_repository
+        self.batch_max_age = batch_max_age
 
     async def create(self, user: User) -> User:
         return await self.user_repository.create(user)
@@ -25,31 +52,146 @@ class UserService:
     async def get_liked_tracks(self, user_id: int) -> List[Track]:
         return await self.user_repository.get_liked_tracks(user_id)
 
+    async def get_recent_liked_tracks(self, user_id: int, n: int = 3) -> List[Track]:
+        return await self.user_repository.get_recent_liked_tracks(user_id, n)
+
     async def get_disliked_tracks(self, user_id: int) -> List[Track]:
         return await self.user_repository.get_disliked_tracks(user_id)
 
     async def handle_user_interaction(
         self, telegram_id: int, track_id: int, interaction_type: InteractionAction
-    ) -> Track:
-        user_id = await self.user_repository.get_user_id_by_telegram_id(
-            telegram_id
-        )
-
-        if user_id is None:
-            raise ValueError(f"User with telegram_id {telegram_id} not found")
-
-        await self.user_repository.create_interaction(
-            user_id=user_id,
+    ) -> Track | None:
+        # Запись взаимодействия и чтение последних лайков - один запрос к БД
+        result = await self.user_repository.create_interaction_returning_likes(
+            telegram_id=telegram_id,
             track_id=track_id,
             action=interaction_type,
+            n=self.RECENT_LIKES,
         )
 
-        user_likes: List[Track] = await self.user_repository.get_liked_tracks(user_id)
+        if result is None:
+            raise ValueError(f"User with telegram_id {telegram_id} not found")
+        user_id = result.user_id
+        genre = result.favorite_music_genre
 
-        next_track_path: str = self.model.pick_next(
-            user_likes
-        )
+        self.popularity.record(genre, result.track_path, interaction_type)
+        await self._update_exclusions(user_id, result.track_path)
+        # Взаимодействие фиксируется до инференса: ожидание модели не держит
+        # открытую транзакцию и подключение из пула
+        await commit_unit_of_work()
+
+        if result.recent_likes:
+            next_track_path = await self._next_track_path(
+                user_id,
+                result.recent_likes,
+                genre,
+                # Лайк только что поменял контекст - офлайн top-K для него еще нет
+                use_precomputed=interaction_type != InteractionAction.like,
+            )
+        else:
+            next_track_path = self._cold_start_path(user_id, genre)
+        if next_track_path is None:
+            return None
 
         next_track: Track = await self.track_repository.get_track_by_path(next_track_path)
 
         return next_track
+
+    async def _next_track_path(
+        self,
+        user_id: int,
+        user_likes: List[Track],
+        genre: str | None = None,
+        use_precomputed: bool = True,
+    ) -> str | None:
+        """
+        Берет трек из очереди рекомендаций, при промахе - из top-K офлайн-задачи,
+        и только если тот устарел, считает top-K заново
+        """
+        queues = self.recommendation_queues
+        context = tuple(track.id for track in user_likes[-self.RECENT_LIKES :])
+
+        next_track_path = queues.pop(user_id, context)
+        if next_track_path is None:
+            paths = await self._precomputed_paths(user_id, context) if use_precomputed else []
+            if not paths:
+                # Чтение офлайн top-K снова заняло подключение - отдаем его до инференса
+                await commit_unit_of_work()
+                try:
+                    paths = await self.model.pick_top_k(
+                        user_likes, queues.size + 1, self.exclusions.get(user_id), genre
+                    )
+                except RecommenderUnavailable as e:
+                    # Взаимодействие уже сохранено, рекомендацию просто пропускаем
+                    logger.warning(f"Recommendation skipped for user {user_id}: {e}")
+                    return None
+            if not paths:
+                return None
+            next_track_path = paths[0]
+            queues.fill(user_id, context, paths[1:], served=[next_track_path])
+
+        if queues.needs_refill(user_id, context):
+            queues.refill_in_background(
+                user_id,
+                context,
+                lambda k: self.model.pick_top_k(
+                    user_likes, k, self.exclusions.get(user_id), genre
+                ),
+            )
+        return next_track_path
+
+    async def _precomputed_paths(self, user_id: int, context: tuple) -> List[str]:
+        """
+        top-K из user_recommendations, если он посчитан для тех же последних
+        лайков, той же версией модели и не старше batch_max_age
+        """
+        if self.recommendation_repository is None:
+            return []
+        recommendation = await self.recommendation_repository.get(user_id)
+        if recommendation is None or recommendation.context != context:
+            return []
+        if self.model.version is not None and recommendation.model_version != self.model.version:
+            return []
+        age = (datetime.now(timezone.utc) - recommendation.created_at).total_seconds()
+        if age > self.batch_max_age:
+            return []
+        # После расчета пользователь мог пропустить или дизлайкнуть часть треков
+        return [
+            path
+            for path in recommendation.track_paths
+            if not self.exclusions.contains(user_id, extract_track_id_from_filename(path))
+        ]
+
+    def _cold_start_path(self, user_id: int, genre: str | None) -> str | None:
+        """
+        Пользователь еще ничего не лайкнул: популярные треки его жанра
+        без инференса модели (через ту же очередь с пустым контекстом)
+        """
+        queues = self.recommendation_queues
+        next_track_path = queues.pop(user_id, ())
+        if next_track_path is None:
+            # Уже отданные треки fill отфильтрует сам, поэтому берем с запасом
+            paths = self.popularity.top(
+                genre,
+                queues.served_count(user_id, ()) + queues.size + 1,
+                exclude=lambda track_id: self.exclusions.contains(user_id, track_id),
+            )
+            queues.fill(user_id, (), paths)
+            next_track_path = queues.pop(user_id, ())
+            if next_track_path is None:
+                logger.info(f"No popular tracks left for cold-start user {user_id}")
+        return next_track_path
+
+    async def _update_exclusions(self, user_id: int, track_path: str | None) -> None:
+        """Добавляет трек в маску исключений, при первом обращении грузит ее из БД"""
+        if self.exclusions.catalog_ids is None:
+            # Модель еще не загрузилась - маску соберем при следующем взаимодействии
+            return
+        if self.exclusions.has(user_id):
+            if track_path is not None:
+                self.exclusions.add(user_id, extract_track_id_from_filename(track_path))
+            return
+        user_tracks = await self.user_repository.get_user_tracks(user_id)
+        self.exclusions.load(
+            user_id, [extract_track_id_from_filename(track.local_path) for track in user_tracks]
+        )